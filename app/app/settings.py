@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -45,7 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its timings cover the other middleware
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,15 +84,176 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # the postgresql backend with a pool of open connections
+        'ENGINE': 'core.db.backends.pooled',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'OPTIONS': {
+            # seconds before an unanswered connection attempt fails
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
+        # connections kept open per process between requests. Remove it
+        # to connect for every request again
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 0)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            # seconds to wait for a connection when all are in use
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+            # seconds before idle connections are closed
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            # seconds of idleness after which a connection is checked
+            # with SELECT 1 before it is used again
+            'CHECK_AFTER': float(os.environ.get('DB_POOL_CHECK_AFTER', 5)),
+        },
     }
 }
 
 
+# Read replicas streaming from the default database, as a comma
+# separated list of hosts. Safe requests read from them, see
+# core.db.routers. Point DB_REPLICA_HOSTS at a second local server, or at
+# DB_HOST itself, to try it out
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')),
+    start=1
+):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'],
+        HOST=host.strip(),
+        # the test runner creates no database of their own for replicas
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+# seconds a client reads from the primary after writing. Replicas
+# further behind than REPLICA_MAX_LAG_SECONDS are not read from, which
+# must be shorter, or a client could read its writes undone once the
+# window ends. Cached responses rely on that too
+REPLICA_STICKY_SECONDS = 5
+REPLICA_MAX_LAG_SECONDS = 2
+# seconds between two measurements of the lag of a replica
+REPLICA_LAG_CHECK_SECONDS = 1
+
+# seconds the result of the /readyz database check is reused for, so
+# frequent probes cost no queries
+READINESS_CACHE_SECONDS = 5
+
+# Send the query, view and render times of each request in a
+# Server-Timing header. They are recorded for /metrics either way
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'
+
+# /metrics answers clients from these networks, comma separated, and
+# those sending METRICS_TOKEN as a bearer token; it is a 404 to others
+METRICS_ALLOWED_NETWORKS = list(filter(None, os.environ.get(
+    'METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128'
+).split(',')))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Caches whose stats() are exported by /metrics, by name
+METRICS_CACHES = {
+    'response': 'recipe.cache.response_cache',
+    'fragment': 'recipe.fragments.fragment_cache',
+    'token': 'user.authentication.token_cache',
+}
+
+# Threads of each process handling requests when served by app.asgi.
+# Every busy thread holds a database connection, so ASGI_THREADS plus
+# ASGI_SLOW_THREADS should not exceed DB_POOL_MAX_SIZE
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))
+
+# Requests to paths matching ASGI_SLOW_PATHS, which upload, export or
+# send files, run on threads of their own so they cannot hold up the
+# quick requests
+ASGI_SLOW_THREADS = int(os.environ.get('ASGI_SLOW_THREADS', 2))
+ASGI_SLOW_PATHS = [
+    r'/upload-image/$',
+    r'/export/$',
+    r'^/media/',
+]
+
+# Requests that may wait for a thread, per pool, before new ones are
+# answered with 503
+ASGI_BACKLOG = int(os.environ.get('ASGI_BACKLOG', 100))
+
+# Largest request body, in bytes, read by app.asgi before the request
+# is dispatched; larger ones are answered with 413
+ASGI_MAX_BODY_SIZE = int(
+    os.environ.get('ASGI_MAX_BODY_SIZE', 20 * 1024 * 1024)
+)
+
+
+# Caches
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# The default cache holds the per-user data versions that invalidate
+# cached API responses. With more than one process it must be shared,
+# or a write would only invalidate the responses of the process that
+# handled it: set CACHE_LOCATION to a memcached server. The local
+# memory cache is only fit for a single process, and
+# `manage.py check --deploy` fails with it
+
+if os.environ.get('CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
+# Cache for recipe, tag and ingredient list responses. Use
+# core.cache.DjangoCache to share it between processes
+RECIPE_RESPONSE_CACHE = {
+    'BACKEND': 'core.cache.LRUCache',
+    'OPTIONS': {'max_bytes': 64 * 1024 * 1024},
+}
+
+# Cache of the encoded json of single recipes, from which recipe lists
+# and details are assembled. Entries carry the recipe's updated_at, so
+# a per-process cache never serves an outdated recipe
+RECIPE_FRAGMENT_CACHE = {
+    'BACKEND': 'core.cache.LRUCache',
+    'OPTIONS': {'max_bytes': 32 * 1024 * 1024},
+}
+
+# Cache of token -> user lookups for CachedTokenAuthentication. Entries
+# are checked against a revocation version in the shared default cache,
+# so a deleted token or changed user is rejected by every process
+AUTH_TOKEN_CACHE = {
+    'BACKEND': 'core.cache.LRUCache',
+    'OPTIONS': {'max_bytes': 8 * 1024 * 1024, 'ttl': 60},
+}
+
+# Token issued by the user:token endpoint. 'db' issues the database
+# backed authtoken tokens. 'signed' issues short-lived signed access
+# tokens, checked without a database query, plus refresh tokens that
+# are exchanged for new ones at user:token-refresh
+USER_TOKEN_MODE = os.environ.get('USER_TOKEN_MODE', 'db')
+
+# (key id, secret) pairs used for signed tokens. The first key signs
+# new tokens and all of them verify, so a key is rotated by adding the
+# new one in front and removing the old one once its tokens expired
+SIGNED_TOKEN_KEYS = [
+    ('default', os.environ.get('SIGNED_TOKEN_SECRET', SECRET_KEY)),
+]
+
+# lifetime of signed tokens in seconds
+SIGNED_TOKEN_LIFETIMES = {
+    'access': 5 * 60,
+    'refresh': 14 * 24 * 60 * 60,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -130,4 +295,35 @@ STATIC_ROOT = '/vol/web/static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 
+# Header handing media files over to the front proxy rather than
+# reading them through Django: 'X-Accel-Redirect' for nginx, with
+# MEDIA_OFFLOAD_PREFIX an internal location aliased to MEDIA_ROOT, or
+# 'X-Sendfile' for apache and lighttpd. Empty serves them from Django
+MEDIA_OFFLOAD_HEADER = os.environ.get('MEDIA_OFFLOAD_HEADER', '')
+MEDIA_OFFLOAD_PREFIX = '/protected-media/'
+
+# Levels of two character directories recipe images are spread over,
+# e.g. uploads/recipe/ab/cd/abcd1234.jpg with 2. Run the shard_images
+# command after changing it to move the images stored already
+RECIPE_IMAGE_SHARD_LEVELS = int(
+    os.environ.get('RECIPE_IMAGE_SHARD_LEVELS', 2)
+)
+
+# Sizes recipe images are resized to after an upload. Each rendition is
+# re-encoded as a JPEG without metadata, fitting within size, or cropped
+# to exactly size when crop is set
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': {'size': (150, 150), 'crop': True, 'quality': 80},
+    'card': {'size': (600, 400), 'crop': True, 'quality': 85},
+    'full': {'size': (1600, 1600), 'quality': 85},
+}
+
+# Processes rendering image renditions. With 0 the renditions are
+# rendered by the request that uploaded the image
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+
+# Images that may wait for a worker before uploads stop queueing more;
+# those left pending are rendered by the process_images command
+RECIPE_IMAGE_BACKLOG = int(os.environ.get('RECIPE_IMAGE_BACKLOG', 100))
+
 AUTH_USER_MODEL = 'core.User'
@@ -15,14 +15,25 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
 from django.conf import settings
 
+from core.views import healthz, readyz, metrics
+from recipe.views import MediaView
+
 urlpatterns = [
+    # probes of the container orchestrator
+    path('healthz', healthz, name='healthz'),
+    path('readyz', readyz, name='readyz'),
+    # scraped by prometheus
+    path('metrics', metrics, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-# makes media url available in our development server,
-# so we can test uploading images for recipes without having
-# set up another web server for serving the media files
+    # media files are only served to the owners of the recipes using
+    # them, so they go through the app rather than straight to disk
+    path(
+        settings.MEDIA_URL.lstrip('/') + '<path:path>',
+        MediaView.as_view(),
+        name='media'
+    ),
+]
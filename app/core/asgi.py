@@ -0,0 +1,273 @@
+import asyncio
+import re
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class RequestBodyTooLarge(Exception):
+    """The request body is larger than ASGI_MAX_BODY_SIZE"""
+
+
+class WorkerPool:
+    """Threads serving requests, with a bound on the requests waiting"""
+
+    def __init__(self, name, threads, backlog):
+        self.name = name
+        self.threads = threads
+        self.backlog = backlog
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix=name)
+        # counted on the event loop, so no lock is needed
+        self.in_flight = 0
+        self.rejected = 0
+        self.served = 0
+
+    def full(self):
+        """Return whether no more requests can be queued"""
+        return self.in_flight >= self.threads + self.backlog
+
+    def stats(self):
+        return {
+            'threads': self.threads,
+            'in_flight': self.in_flight,
+            'rejected': self.rejected,
+            'served': self.served,
+        }
+
+
+class ThreadPoolASGIHandler:
+    """Serve a WSGI application to an ASGI server
+
+    The event loop receives the requests and sends the responses, and
+    the Django request handling, with its ORM calls, runs in a sized
+    pool of threads. Requests to paths matching ASGI_SLOW_PATHS, such
+    as uploads, exports and media, run in a pool of their own, so they
+    cannot take every thread from the quick requests. Each request
+    runs in a single thread from start to end, including streaming
+    its response, as Django's database connections belong to the
+    thread that opened them.
+    """
+
+    def __init__(self, wsgi_application):
+        self.wsgi_application = wsgi_application
+        self.pool = WorkerPool(
+            'asgi',
+            settings.ASGI_THREADS,
+            settings.ASGI_BACKLOG
+        )
+        self.slow_pool = WorkerPool(
+            'asgi-slow',
+            settings.ASGI_SLOW_THREADS,
+            settings.ASGI_BACKLOG
+        )
+        self.slow_paths = None
+        if settings.ASGI_SLOW_PATHS:
+            self.slow_paths = re.compile('|'.join(
+                f'(?:{pattern})' for pattern in settings.ASGI_SLOW_PATHS
+            ))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Unsupported scope type {scope["type"]}')
+
+        pool = self.pool_for(scope['path'])
+        if pool.full():
+            pool.rejected += 1
+            return await self.unavailable(send)
+        pool.in_flight += 1
+        try:
+            try:
+                body = await self.read_body(scope, receive)
+            except RequestBodyTooLarge:
+                return await self.too_large(send)
+            if body is None:
+                return
+            with body:
+                await self.run(pool, scope, body, receive, send)
+            pool.served += 1
+        finally:
+            pool.in_flight -= 1
+
+    def pool_for(self, path):
+        """Return the pool serving requests for path"""
+        if self.slow_paths is not None and self.slow_paths.search(path):
+            return self.slow_pool
+        return self.pool
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for pool in (self.pool, self.slow_pool):
+                    pool.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def unavailable(self, send):
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'text/plain'),
+                (b'retry-after', b'1'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b'Server busy, retry later.',
+        })
+
+    async def too_large(self, send):
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [
+                (b'content-type', b'text/plain'),
+                (b'connection', b'close'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b'Request body too large.',
+        })
+
+    async def read_body(self, scope, receive):
+        """Return the request body as a file, or None if the client
+        disconnected
+
+        Raises RequestBodyTooLarge once the body is found to be larger
+        than ASGI_MAX_BODY_SIZE, without reading the rest of it.
+        """
+        max_size = settings.ASGI_MAX_BODY_SIZE
+        for name, value in scope.get('headers', ()):
+            if name.lower() == b'content-length' and value.isdigit() \
+                    and int(value) > max_size:
+                raise RequestBodyTooLarge
+        # large uploads are spooled to disk like Django does
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > max_size:
+                # chunked bodies only show their size as they arrive
+                body.close()
+                raise RequestBodyTooLarge
+            body.write(chunk)
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    async def run(self, pool, scope, body, receive, send):
+        """Handle the request in a thread of pool"""
+        loop = asyncio.get_event_loop()
+        disconnected = threading.Event()
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        watcher = loop.create_task(watch_disconnect())
+        try:
+            await loop.run_in_executor(
+                pool.executor,
+                self.handle,
+                self.get_environ(scope, body),
+                lambda message: asyncio.run_coroutine_threadsafe(
+                    send(message),
+                    loop
+                ).result(),
+                disconnected
+            )
+        finally:
+            watcher.cancel()
+
+    def handle(self, environ, send, disconnected):
+        """Run the WSGI application and send its response, in a thread
+
+        Sends block until the server took the message, which keeps a
+        streamed response from running ahead of a slow client.
+        """
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            start['status'] = int(status.split(' ', 1)[0])
+            start['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ]
+
+        response = self.wsgi_application(environ, start_response)
+        try:
+            send(dict(type='http.response.start', **start))
+            for chunk in response:
+                if disconnected.is_set():
+                    return
+                if chunk:
+                    send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # fires request_finished, which hands the thread's database
+            # connection back to the pool
+            close = getattr(response, 'close', None)
+            if close is not None:
+                close()
+
+    def get_environ(self, scope, body):
+        """Return the WSGI environ of an ASGI http scope"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            # WSGI carries the raw bytes of the path as latin-1
+            'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'REMOTE_ADDR': client[0],
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', ()):
+            name = name.decode('latin1').upper().replace('-', '_')
+            value = value.decode('latin1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = f'HTTP_{name}'
+            if name in environ:
+                # HTTP/2 sends each cookie in a header of its own, which
+                # are joined the way a single cookie header lists them
+                separator = '; ' if name == 'HTTP_COOKIE' else ','
+                value = f'{environ[name]}{separator}{value}'
+            environ[name] = value
+        if 'CONTENT_LENGTH' not in environ:
+            # a chunked body, whose length is known now
+            body.seek(0, 2)
+            environ['CONTENT_LENGTH'] = str(body.tell())
+            body.seek(0)
+        return environ
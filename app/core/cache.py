@@ -0,0 +1,126 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+class LRUCache:
+    """In-process cache that evicts the least recently used entries
+
+    Values are stored pickled, which gives every reader its own copy
+    and lets the cache be bounded by the size of what it holds rather
+    than by the number of entries.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        # key -> (expiry time or None, pickled value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None \
+                    and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(entry[1])
+
+    def set(self, key, value):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._remove(key)
+            # a value larger than the whole cache would evict everything
+            if len(payload) > self.max_bytes:
+                return
+            self._entries[key] = (expires, payload)
+            self._size += len(payload)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Return the hit/miss counters and current footprint"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._size,
+        }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+
+class DjangoCache:
+    """Cache kept in one of the CACHES aliases and shared by processes"""
+
+    def __init__(self, alias='default', timeout=300):
+        self.alias = alias
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, key):
+        """Return key hashed to a fixed length
+
+        Keys such as those of list responses hold the whole query
+        string, which can be longer than memcached's 250 characters.
+        """
+        return 'core-cache:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key, default=None):
+        # use a sentinel so that cached falsy values still count as hits
+        value = caches[self.alias].get(self.make_key(key), self)
+        if value is self:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        caches[self.alias].set(self.make_key(key), value, self.timeout)
+
+    def delete(self, key):
+        caches[self.alias].delete(self.make_key(key))
+
+    def clear(self):
+        caches[self.alias].clear()
+
+    def stats(self):
+        """Return the hit/miss counters seen by this process"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+def build_cache(config):
+    """Create the cache described by a {'BACKEND', 'OPTIONS'} setting"""
+    backend = import_string(config['BACKEND'])
+    return backend(**config.get('OPTIONS', {}))
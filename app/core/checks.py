@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# cache backend whose entries are only seen by the process storing them
+LOCAL_MEMORY_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def default_cache_is_local():
+    """Return whether the default cache is private to each process"""
+    return settings.CACHES['default']['BACKEND'] == LOCAL_MEMORY_CACHE
+
+
+@register(Tags.caches, deploy=True)
+def check_data_version_cache(app_configs, **kwargs):
+    """Check the per-user data versions are shared by the processes
+
+    A write bumps the version in the cache of the process handling it,
+    and the other processes would keep serving cached responses of the
+    old data.
+    """
+    if not default_cache_is_local():
+        return []
+    return [Error(
+        'The default cache is private to each process, so cached API '
+        'responses outlive writes handled by other processes.',
+        hint='Set CACHE_LOCATION to a memcached server.',
+        id='core.E001',
+    )]
+
+
+@register(Tags.caches)
+def check_replica_sticky_cache(app_configs, **kwargs):
+    """Check the read-your-writes windows are shared by the processes
+
+    ReplicaMiddleware keeps them in the default cache. A process that
+    does not see a client's window lets it read a lagging replica.
+    """
+    if not settings.DATABASE_REPLICAS or not default_cache_is_local():
+        return []
+    return [Error(
+        'Read replicas are configured, but the default cache is private '
+        'to each process, so clients may not read their own writes.',
+        hint='Set CACHE_LOCATION to a memcached server.',
+        id='core.E002',
+    )]
@@ -0,0 +1,86 @@
+from django.db.backends.postgresql import base, creation
+
+from core.db.pool import all_pools, get_pool
+
+
+# defaults of the POOL options of a database
+POOL_DEFAULTS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    # seconds to wait for a free connection when the pool is full
+    'TIMEOUT': 5,
+    # seconds an idle connection is kept open
+    'MAX_IDLE': 300,
+    # seconds after which an idle connection is probed before reuse
+    'CHECK_AFTER': 5,
+}
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # a database can only be dropped once nothing is connected
+        for pool in all_pools().values():
+            pool.close_idle()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Postgres backend keeping connections open in a process-wide pool
+
+    Closing a connection, which Django does at the end of every request
+    with CONN_MAX_AGE = 0, hands it back to the pool, and the next
+    request checks it out instead of connecting again. The pool is
+    configured with the POOL dictionary of the database settings and
+    left out when POOL is not set.
+    """
+    creation_class = DatabaseCreation
+
+    @property
+    def pool(self):
+        """Return the pool of this database's connections, or None"""
+        options = self.settings_dict.get('POOL')
+        if options is None:
+            return None
+        options = dict(POOL_DEFAULTS, **options)
+        conn_params = self.get_connection_params()
+        # databases are told apart by everything used to connect, as
+        # the test runner renames the database it connects to
+        key = (self.alias, tuple(sorted(
+            (name, str(value)) for name, value in conn_params.items()
+        )))
+        return get_pool(
+            key,
+            lambda: base.Database.connect(**conn_params),
+            min_size=options['MIN_SIZE'],
+            max_size=options['MAX_SIZE'],
+            timeout=options['TIMEOUT'],
+            max_idle=options['MAX_IDLE'],
+            check_after=options['CHECK_AFTER'],
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.checkout()
+        # as in the postgresql backend, which connects instead
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level',
+            connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        if self.in_atomic_block:
+            # Django keeps using the connection object until the atomic
+            # block exits, so it cannot go to another thread
+            pool.discard(self.connection)
+        else:
+            pool.checkin(self.connection)
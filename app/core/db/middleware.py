@@ -0,0 +1,58 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.db.routers import replica_reads
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def client_key(request):
+    """Return a key identifying the client by its credentials, or None
+
+    Token authentication runs in the views, after the middleware, so
+    the client is told by its Authorization header or session cookie.
+    """
+    credentials = request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    digest = hashlib.sha256(credentials.encode()).hexdigest()
+    return f'replica:sticky:{digest}'
+
+
+class ReplicaMiddleware:
+    """Let safe requests read from the replicas
+
+    A client that writes reads from the primary for the next
+    REPLICA_STICKY_SECONDS, so it sees its own writes while the
+    replicas catch up. The window is kept in the default cache, which
+    must be shared by the processes for the window to cover them all,
+    see core.checks. Another client of the same user is not held to
+    the primary, so responses read from a replica are never cached,
+    see CachedListMixin.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        key = client_key(request)
+        if request.method in SAFE_METHODS:
+            sticky = key is not None and cache.get(key) is not None
+            with replica_reads(not sticky):
+                return self.get_response(request)
+
+        if key is None:
+            return self.get_response(request)
+        # concurrent reads of the client go to the primary during the
+        # write too, and for the window after it was committed
+        cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+        response = self.get_response(request)
+        cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
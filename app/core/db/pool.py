@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+from collections import deque
+
+from psycopg2 import Error as DatabaseError, OperationalError, extensions
+
+
+class PoolTimeout(OperationalError):
+    """No connection was returned to a full pool in time"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of open psycopg2 connections
+
+    Connections are handed out most recently returned first, so the
+    surplus of a busy period sits idle until it is evicted. A
+    connection that sat idle for longer than check_after seconds is
+    probed with SELECT 1 before it is handed out again.
+    """
+
+    def __init__(self, connect, min_size=0, max_size=10, timeout=5,
+                 max_idle=300, check_after=5):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.pid = os.getpid()
+        self.size = 0
+        self.waiters = 0
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.failed_checks = 0
+        self.checkout_seconds = 0.0
+        self.max_checkout_seconds = 0.0
+        # (connection, time it was returned)
+        self._idle = deque()
+        self._condition = threading.Condition()
+
+    def checkout(self):
+        """Return a connection, opening one if the pool is not full
+
+        Raises PoolTimeout if none is free within the timeout.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._condition:
+            self._check_fork()
+            evicted = self._evict_idle()
+            while True:
+                if self._idle:
+                    connection, returned = self._idle.pop()
+                elif self.size < self.max_size:
+                    # opened outside the lock, the slot is taken now
+                    self.size += 1
+                    connection = returned = None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f'no database connection free after '
+                            f'{self.timeout}s ({self.max_size} in use)'
+                        )
+                    self.waiters += 1
+                    try:
+                        self._condition.wait(remaining)
+                    finally:
+                        self.waiters -= 1
+                    continue
+                break
+
+        for idle in evicted:
+            self._close(idle)
+        if connection is None:
+            connection = self._open()
+        elif not self._healthy(connection, returned):
+            self._discard(connection)
+            return self.checkout()
+        self._record_checkout(time.monotonic() - start)
+        return connection
+
+    def checkin(self, connection):
+        """Take a connection back, closing it if it is broken"""
+        if not self._reset(connection):
+            self._discard(connection)
+            return
+        with self._condition:
+            if os.getpid() != self.pid:
+                return
+            self._idle.append((connection, time.monotonic()))
+            evicted = self._evict_idle()
+            self._condition.notify()
+        for idle in evicted:
+            self._close(idle)
+
+    def discard(self, connection):
+        """Close a checked out connection for good"""
+        self._discard(connection)
+
+    def close_idle(self):
+        """Close every idle connection"""
+        with self._condition:
+            idle, self._idle = self._idle, deque()
+            self.size -= len(idle)
+            self.closed += len(idle)
+        for connection, returned in idle:
+            self._close(connection)
+
+    def stats(self):
+        """Return the pool's gauges and counters"""
+        with self._condition:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': self.size - len(self._idle),
+                'waiters': self.waiters,
+                'created': self.created,
+                'closed': self.closed,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'failed_checks': self.failed_checks,
+                'checkout_seconds': self.checkout_seconds,
+                'max_checkout_seconds': self.max_checkout_seconds,
+            }
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self.size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.created += 1
+        return connection
+
+    def _healthy(self, connection, returned):
+        """Return whether an idle connection can be used again"""
+        if connection.closed:
+            return False
+        if time.monotonic() - returned < self.check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except DatabaseError:
+            with self._condition:
+                self.failed_checks += 1
+            return False
+        return True
+
+    def _reset(self, connection):
+        """Return a connection to a clean session, or return False
+
+        What it left open is rolled back, then DISCARD ALL drops the
+        session state a transaction does not scope: SET parameters,
+        temporary tables, session advisory locks, prepared statements
+        and WITH HOLD cursors.
+        """
+        if connection.closed:
+            return False
+        status = connection.get_transaction_status()
+        if status not in (extensions.TRANSACTION_STATUS_IDLE,
+                          extensions.TRANSACTION_STATUS_INTRANS,
+                          extensions.TRANSACTION_STATUS_INERROR):
+            # a query is still running or the server is gone
+            return False
+        try:
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            # DISCARD ALL cannot run in a transaction block
+            autocommit = connection.autocommit
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute('DISCARD ALL')
+                # psycopg2 does not notice the encoding it set was
+                # reset, and would not set it again
+                encoding = connection.encoding
+                if connection.get_parameter_status(
+                        'client_encoding') != encoding:
+                    cursor.execute(
+                        'SET client_encoding TO %s',
+                        [encoding]
+                    )
+            connection.autocommit = autocommit
+        except DatabaseError:
+            return False
+        return True
+
+    def _discard(self, connection):
+        with self._condition:
+            if os.getpid() != self.pid:
+                return
+            self.size -= 1
+            self.closed += 1
+            self._condition.notify()
+        self._close(connection)
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except DatabaseError:
+            pass
+
+    def _evict_idle(self):
+        """Take out the connections idle for longer than max_idle,
+        keeping min_size open, and return them for closing. Called with
+        the lock held"""
+        expired = time.monotonic() - self.max_idle
+        evicted = []
+        # the oldest returned connections are at the left
+        while self._idle and self.size > self.min_size \
+                and self._idle[0][1] < expired:
+            evicted.append(self._idle.popleft()[0])
+            self.size -= 1
+            self.closed += 1
+        return evicted
+
+    def _check_fork(self):
+        """Forget connections inherited from the parent process, which
+        must not be shared. Called with the lock held"""
+        if os.getpid() != self.pid:
+            self.pid = os.getpid()
+            self._idle.clear()
+            self.size = 0
+
+    def _record_checkout(self, seconds):
+        with self._condition:
+            self.checkouts += 1
+            self.checkout_seconds += seconds
+            self.max_checkout_seconds = max(
+                self.max_checkout_seconds,
+                seconds
+            )
+
+
+# pools of the process, by connection parameters
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, **options):
+    """Return the pool for key, creating it with options"""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, **options)
+        return pool
+
+
+def all_pools():
+    """Return the pools of the process, by connection parameters"""
+    with _pools_lock:
+        return dict(_pools)
@@ -0,0 +1,130 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+
+logger = logging.getLogger(__name__)
+
+# seconds the replica is behind the primary. Nothing is behind when
+# the replica has replayed everything it received, however long ago
+# the last write was
+LAG_SQL = (
+    'SELECT CASE '
+    'WHEN NOT pg_is_in_recovery() THEN 0 '
+    'WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE COALESCE(EXTRACT(EPOCH FROM '
+    'now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+# apps always read from the primary. A client that just logged in has
+# sent no credentials yet that could make it stick to the primary
+PRIMARY_APPS = ('authtoken', 'sessions')
+
+_state = threading.local()
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Let the reads of the current thread go to the replicas"""
+    previous = (
+        getattr(_state, 'replica_reads', False),
+        getattr(_state, 'read_from_replica', False),
+    )
+    _state.replica_reads = enabled
+    _state.read_from_replica = False
+    try:
+        yield
+    finally:
+        _state.replica_reads, _state.read_from_replica = previous
+
+
+def read_from_replica():
+    """Return whether the current replica_reads block read from a
+    replica
+
+    Data read from a replica may lag behind the data version of the
+    user, so it must not be cached or tagged under that version.
+    """
+    return getattr(_state, 'read_from_replica', False)
+
+
+class ReplicaLag:
+    """Replication lag of each replica, measured at most every
+    REPLICA_LAG_CHECK_SECONDS"""
+
+    def __init__(self):
+        # alias -> (time measured, lag in seconds)
+        self._lags = {}
+
+    def get(self, alias):
+        """Return the lag of a replica, infinite if it is unreachable"""
+        measured = self._lags.get(alias)
+        now = time.monotonic()
+        if measured is None or \
+                now - measured[0] >= settings.REPLICA_LAG_CHECK_SECONDS:
+            measured = self._lags[alias] = (now, self.measure(alias))
+        return measured[1]
+
+    def measure(self, alias):
+        """Query the lag of a replica"""
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            logger.warning('Replica %s is unreachable', alias, exc_info=True)
+            return float('inf')
+
+    def stats(self):
+        """Return the last measured lag of each replica"""
+        return {alias: lag for alias, (measured, lag) in self._lags.items()}
+
+    def clear(self):
+        self._lags.clear()
+
+
+replica_lag = ReplicaLag()
+
+
+class ReplicaRouter:
+    """Send reads to a replica when the current request allows it
+
+    ReplicaMiddleware allows it for safe requests of clients that have
+    not written recently. Reads inside a transaction, and every write,
+    go to the primary. Replicas lagging more than
+    REPLICA_MAX_LAG_SECONDS are skipped.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'replica_reads', False) \
+                or model._meta.app_label in PRIMARY_APPS \
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [
+            alias for alias in settings.DATABASE_REPLICAS
+            if replica_lag.get(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+        ]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        _state.read_from_replica = True
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # also for objects that were read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas receive the schema from the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import connections, router, transaction
+from django.db.transaction import TransactionManagementError
+from django.db.models.fields.files import ImageFieldFile
+from django.db.models import ImageField
+
+
+def file_digest(content):
+    """Return the sha256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def lock_file_name(name, using):
+    """Lock a stored file name until the current transaction ends
+
+    Files named after their content are shared, so saving one must not
+    interleave with deleting it once it seems unused. Both take this
+    lock, and the deletion checks for users of the file under it.
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        raise TransactionManagementError(
+            'Stored file names can only be locked in a transaction.'
+        )
+    # advisory locks take a signed 64-bit key
+    key = int.from_bytes(
+        hashlib.sha256(name.encode()).digest()[:8],
+        'big',
+        signed=True
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage for files named after their content
+
+    Saving a file under a name that is taken keeps the stored file, as
+    it holds the same bytes, instead of picking another name.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            return name
+
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # write to a temporary file and link it in place, so the file
+        # never shows up half written to a concurrent upload of the
+        # same content
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temp:
+            for chunk in content.chunks():
+                temp.write(chunk)
+        try:
+            if self.file_permissions_mode is not None:
+                os.chmod(temp.name, self.file_permissions_mode)
+            os.link(temp.name, full_path)
+        except FileExistsError:
+            # saved by a concurrent upload in the meantime
+            pass
+        finally:
+            os.remove(temp.name)
+        return name
+
+
+class ContentAddressedFieldFile(ImageFieldFile):
+    """Image file hashing its content before it is named"""
+
+    def save(self, name, content, save=True):
+        # read by the field's upload_to to name the file
+        self.digest = file_digest(content)
+        using = router.db_for_write(
+            type(self.instance),
+            instance=self.instance
+        )
+        # the lock is held until the recipe referencing the file is
+        # committed, so a concurrent release cannot delete the file in
+        # between; the model's own save is not atomic, so the file save
+        # opens a transaction of its own when it is not in one
+        with transaction.atomic(using=using):
+            lock_file_name(
+                self.field.generate_filename(self.instance, name),
+                using
+            )
+            super().save(name, content, save)
+
+
+class ContentAddressedImageField(ImageField):
+    """Image field storing identical images in a single file
+
+    upload_to can name a file after the digest attribute of the field
+    file being saved, and the storage then keeps one copy per name.
+    """
+    attr_class = ContentAddressedFieldFile
@@ -0,0 +1,306 @@
+import csv
+import io
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Tag, Ingredient, Recipe, ImportCheckpoint
+from recipe.export import split_names
+from recipe.cache import invalidate_user_cache
+
+
+# plain recipe columns read from the input
+RECIPE_FIELDS = ('title', 'time_minutes', 'price', 'link')
+
+# relation name, model and through table column of each m2m field
+RELATIONS = (
+    ('tags', Tag, 'tag_id'),
+    ('ingredients', Ingredient, 'ingredient_id'),
+)
+
+
+def read_jsonl(stream):
+    """Yield the records of a json lines stream"""
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # reported as an invalid record by clean_record
+            yield None
+
+
+def read_csv(stream):
+    """Yield the records of a csv stream with a header row"""
+    for row in csv.DictReader(stream):
+        for field, model, column in RELATIONS:
+            row[field] = split_names(row.get(field) or '')
+        yield row
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+def clean_record(record):
+    """Return the validated values of a record
+
+    Raises ValidationError if the record cannot be imported.
+    """
+    if not isinstance(record, dict):
+        raise ValidationError('Expected a json object.')
+    values = {}
+    for name in RECIPE_FIELDS:
+        field = Recipe._meta.get_field(name)
+        value = record.get(name, field.get_default())
+        values[name] = field.clean(value, None)
+    for field, model, column in RELATIONS:
+        names = record.get(field) or []
+        if not isinstance(names, list):
+            raise ValidationError(f'{field} must be a list of names.')
+        name_field = model._meta.get_field('name')
+        values[field] = list(dict.fromkeys(
+            name_field.clean(str(name).strip(), None)
+            for name in names if str(name).strip()
+        ))
+    return values
+
+
+def copy_rows(cursor, table, rows):
+    """Load rows into table with COPY"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f'COPY {table} FROM STDIN WITH (FORMAT csv)',
+        buffer
+    )
+
+
+class Command(BaseCommand):
+    """Django command to load recipes in bulk from a jsonl or csv file
+
+    Each batch is copied into temporary staging tables and then merged
+    into the recipe tables, in one transaction that also records how
+    far the import got. An interrupted import resumes from the last
+    committed batch when it is run again.
+    """
+    help = 'Import recipes for a user from a jsonl or csv file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='input file, or - for stdin')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='email of the user owning the recipes'
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='input format, guessed from the file extension if unset'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help='name the progress is saved under, '
+                 'defaults to the user and input path'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='ignore the saved progress and import from the start'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        try:
+            self.user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["user"]}.')
+
+        path = options['path']
+        input_format = options['format']
+        if input_format is None:
+            input_format = 'csv' if path.endswith('.csv') else 'jsonl'
+        name = options['checkpoint'] or ':'.join((
+            self.user.email,
+            path if path == '-' else os.path.abspath(path)
+        ))
+        checkpoint, _created = ImportCheckpoint.objects.get_or_create(
+            name=name
+        )
+        if options['restart']:
+            checkpoint.position = 0
+            checkpoint.finished = False
+        elif checkpoint.finished:
+            self.stdout.write(f'Import {name} has already finished.')
+            return
+        elif checkpoint.position:
+            self.stdout.write(
+                f'Resuming after {checkpoint.position} records.'
+            )
+
+        # tag and ingredient ids resolved so far, by name
+        self.names = {model: {} for field, model, column in RELATIONS}
+        self.imported = self.skipped = 0
+        self.started = time.monotonic()
+        self.create_staging_tables()
+
+        if path == '-':
+            self.import_stream(sys.stdin, input_format, checkpoint, options)
+        else:
+            with open(path, newline='', encoding='utf-8') as stream:
+                self.import_stream(stream, input_format, checkpoint, options)
+
+        checkpoint.finished = True
+        checkpoint.save()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} recipes, '
+            f'skipped {self.skipped} invalid records.'
+        ))
+
+    def import_stream(self, stream, input_format, checkpoint, options):
+        """Import the records of stream not imported before"""
+        records = islice(
+            READERS[input_format](stream),
+            checkpoint.position,
+            None
+        )
+        while True:
+            batch = list(islice(records, options['batch_size']))
+            if not batch:
+                return
+            items = []
+            for number, record in enumerate(batch, checkpoint.position + 1):
+                try:
+                    items.append(clean_record(record))
+                except ValidationError as error:
+                    self.skipped += 1
+                    self.stderr.write(
+                        f'Skipping record {number}: '
+                        + ' '.join(error.messages)
+                    )
+
+            with transaction.atomic():
+                if items:
+                    self.import_batch(items)
+                checkpoint.position += len(batch)
+                checkpoint.save()
+            self.imported += len(items)
+            self.report(checkpoint.position)
+
+    def report(self, position):
+        """Write the progress of the import"""
+        elapsed = time.monotonic() - self.started
+        rate = self.imported / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{position} records read, {self.imported} imported '
+            f'({rate:.0f} recipes/s)'
+        )
+
+    def create_staging_tables(self):
+        """Create the session's staging tables, unless they exist"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE IF NOT EXISTS import_recipe ('
+                'id integer, title varchar(255), time_minutes integer, '
+                'price numeric(5, 2), link varchar(255))'
+            )
+            for field, model, column in RELATIONS:
+                cursor.execute(
+                    f'CREATE TEMPORARY TABLE IF NOT EXISTS import_{field} ('
+                    f'recipe_id integer, {column} integer)'
+                )
+
+    def resolve_names(self, model, names):
+        """Return the ids of the user's objects named names
+
+        Missing objects are created with a single insert. When the user
+        already has several objects with the same name, the oldest one
+        is used.
+        """
+        known = self.names[model]
+        wanted = [name for name in names if name not in known]
+        if wanted:
+            found = model.objects.filter(
+                user=self.user,
+                name__in=wanted
+            ).order_by('-id').values_list('name', 'id')
+            known.update(found)
+            created = model.objects.bulk_create([
+                model(user=self.user, name=name)
+                for name in wanted if name not in known
+            ])
+            known.update((obj.name, obj.pk) for obj in created)
+        return known
+
+    def import_batch(self, items):
+        """Copy a batch of cleaned records into the recipe tables"""
+        quote = connection.ops.quote_name
+        recipe_table = quote(Recipe._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'TRUNCATE import_recipe, '
+                + ', '.join(f'import_{field}' for field, *_ in RELATIONS)
+            )
+            # take the ids from the recipe sequence up front, so the
+            # relation rows can be staged along with the recipes
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)',
+                [Recipe._meta.db_table, 'id', len(items)]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+
+            copy_rows(cursor, 'import_recipe', (
+                [pk] + [item[name] for name in RECIPE_FIELDS]
+                for pk, item in zip(ids, items)
+            ))
+            cursor.execute(
+                f'INSERT INTO {recipe_table} '
+                '(id, user_id, title, time_minutes, price, link, '
+                'image_status, updated_at) '
+                # COPY reads empty csv values as null
+                'SELECT id, %s, title, time_minutes, price, '
+                "COALESCE(link, ''), '', now() "
+                'FROM import_recipe',
+                [self.user.pk]
+            )
+
+            for field, model, column in RELATIONS:
+                names = {name for item in items for name in item[field]}
+                if not names:
+                    continue
+                known = self.resolve_names(model, names)
+                copy_rows(cursor, f'import_{field}', (
+                    (pk, known[name])
+                    for pk, item in zip(ids, items)
+                    for name in item[field]
+                ))
+                through_table = quote(
+                    getattr(Recipe, field).through._meta.db_table
+                )
+                cursor.execute(
+                    f'INSERT INTO {through_table} (recipe_id, {column}) '
+                    f'SELECT recipe_id, {column} FROM import_{field}'
+                )
+                # every staged row is a new relation, so the counts are
+                # raised by the staged rows rather than recounted
+                cursor.execute(
+                    f'UPDATE {quote(model._meta.db_table)} AS counted '
+                    'SET recipe_count = counted.recipe_count + staged.count '
+                    f'FROM (SELECT {column} AS id, COUNT(*) AS count '
+                    f'FROM import_{field} GROUP BY {column}) AS staged '
+                    'WHERE counted.id = staged.id'
+                )
+
+        # the rows were written without the ORM, so no signal was sent
+        invalidate_user_cache(self.user.pk)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.images import render_recipe_image
+
+
+class Command(BaseCommand):
+    """Django command to render the renditions of pending recipe images
+
+    Images are left pending when the workers' backlog is full or the
+    server stops before they are rendered.
+    """
+    help = 'Render the renditions of recipe images still pending'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--failed',
+            action='store_true',
+            help='also retry images that failed to render'
+        )
+
+    def handle(self, *args, **options):
+        statuses = [Recipe.IMAGE_PENDING]
+        if options['failed']:
+            statuses.append(Recipe.IMAGE_FAILED)
+        recipes = Recipe.objects.filter(image_status__in=statuses)
+        count = 0
+        for recipe in recipes.only('id', 'user_id', 'image').iterator():
+            render_recipe_image(recipe)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Processed {count} images.'))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from core.models import Tag, Ingredient
+from recipe.cache import invalidate_user_cache
+from recipe.counts import recipe_count_subquery, refresh_recipe_counts
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the recipe counts of tags and ingredients
+
+    The rows are recounted in batches of ids, each in its own short
+    transaction, so the command can run while the app serves requests.
+    Only counts that are wrong are written.
+    """
+    help = 'Recount the recipes using each tag and ingredient'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        for model in (Tag, Ingredient):
+            repaired = self.repair(model, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Repaired {repaired} {model._meta.verbose_name_plural}.'
+            ))
+
+    def repair(self, model, batch_size):
+        """Fix the wrong counts of model, returning how many there were"""
+        repaired = 0
+        last = 0
+        while True:
+            ids = list(model.objects.filter(pk__gt=last).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return repaired
+            last = ids[-1]
+            with transaction.atomic():
+                wrong = dict(model.objects.filter(pk__in=ids).annotate(
+                    actual=recipe_count_subquery(model)
+                ).exclude(
+                    recipe_count=F('actual')
+                ).values_list('pk', 'user_id'))
+                refresh_recipe_counts(model, wrong)
+                for user_id in set(wrong.values()):
+                    invalidate_user_cache(user_id)
+            repaired += len(wrong)
@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+
+from core.models import Recipe, recipe_image_path
+from recipe.cache import invalidate_user_cache
+from recipe.images import rendition_names
+
+
+def stored_names(name):
+    """Return the names of an image and of its renditions"""
+    return [name, *rendition_names(name).values()]
+
+
+def link_image(storage, old, new):
+    """Link an image and its renditions at their new names
+
+    Returns False if the image itself is missing.
+    """
+    for source, target in zip(stored_names(old), stored_names(new)):
+        source_path = storage.path(source)
+        if not os.path.exists(source_path):
+            if source == old:
+                return False
+            # renditions not rendered yet are rendered at the new name
+            continue
+        target_path = storage.path(target)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        try:
+            os.link(source_path, target_path)
+        except FileExistsError:
+            # linked by an earlier, interrupted run
+            pass
+    return True
+
+
+def unlink_image(storage, name):
+    """Remove the old names of an image and of its renditions"""
+    for stored_name in stored_names(name):
+        storage.delete(stored_name)
+
+
+class Command(BaseCommand):
+    """Django command to move recipe images to the configured layout
+
+    Each file is linked at its new path before the recipes are pointed
+    at it, and only unlinked from the old path once that is committed,
+    so the stored path of every recipe resolves to a file while the
+    app keeps serving requests. A run that is interrupted is finished
+    by running the command again.
+    """
+    help = 'Move recipe images to the RECIPE_IMAGE_SHARD_LEVELS layout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='threads linking and unlinking files'
+        )
+        parser.add_argument(
+            '--keep-old',
+            action='store_true',
+            help='leave the files at their old paths for cached urls'
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        names = Recipe.objects.exclude(image__isnull=True).exclude(
+            image=''
+        ).order_by('image').values_list('image', flat=True).distinct()
+        moves = (
+            (name, recipe_image_path(os.path.basename(name)))
+            for name in names.iterator()
+        )
+        moves = ((old, new) for old, new in moves if old != new)
+
+        moved = missing = 0
+        with ThreadPoolExecutor(options['workers']) as executor:
+            while True:
+                batch = list(islice(moves, options['batch_size']))
+                if not batch:
+                    break
+                linked = executor.map(
+                    lambda move: link_image(storage, *move),
+                    batch
+                )
+                found = [move for move, ok in zip(batch, linked) if ok]
+                missing += len(batch) - len(found)
+                batch = found
+
+                self.update_recipes(batch)
+                if not options['keep_old']:
+                    list(executor.map(
+                        lambda move: unlink_image(storage, move[0]),
+                        batch
+                    ))
+                moved += len(batch)
+                self.stdout.write(f'{moved} images moved')
+
+        if missing:
+            self.stderr.write(f'{missing} images were missing and kept.')
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} images.'))
+
+    def update_recipes(self, moves):
+        """Point the recipes using the moved images at their new paths"""
+        if not moves:
+            return
+        with transaction.atomic():
+            # only recipes still using the old image are changed
+            recipes = Recipe.objects.filter(
+                image__in=[old for old, new in moves]
+            )
+            user_ids = list(
+                recipes.values_list('user_id', flat=True).distinct()
+            )
+            recipes.update(
+                image=Case(
+                    *(When(image=old, then=Value(new)) for old, new in moves),
+                    output_field=CharField()
+                ),
+                updated_at=timezone.now()
+            )
+            for user_id in user_ids:
+                invalidate_user_cache(user_id)
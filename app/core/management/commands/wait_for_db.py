@@ -1,22 +1,80 @@
+import random
 import time
 
 from django.db import connections
 from django.db.utils import OperationalError
 # Base command class for us to build custom management commands
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
-    """Django command to pause execution until database is available"""
+    """Django command to pause execution until database is available
 
-    def handle(self, *args, **kwargs):
+    Getting a connection object from django opens no socket, so the
+    database is probed with a query. Failed probes are retried after
+    exponentially growing delays with random jitter, so that many
+    containers starting together do not hit the database in lockstep,
+    until the deadline is reached.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60,
+            help='seconds to wait before giving up'
+        )
+        parser.add_argument(
+            '--initial-delay',
+            type=float,
+            default=0.1,
+            help='seconds to wait after the first failed probe'
+        )
+        parser.add_argument(
+            '--max-delay',
+            type=float,
+            default=5,
+            help='longest wait between two probes'
+        )
+
+    def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        deadline = time.monotonic() + options['timeout']
+        delay = options['initial_delay']
+        while True:
+            start = time.monotonic()
             try:
-                # Try to set db_conn variable to the db connection
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+                self.probe()
+            except OperationalError as error:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database unavailable after '
+                        f'{options["timeout"]:g} seconds: {error}'
+                    )
+                # sleep between half and all of the delay
+                wait = min(delay * random.uniform(0.5, 1), remaining)
+                self.stdout.write(
+                    f'Database unavailable, waiting {wait:.2f} seconds...'
+                )
+                time.sleep(wait)
+                delay = min(delay * 2, options['max_delay'])
+                continue
+            elapsed = (time.monotonic() - start) * 1000
+            self.stdout.write(self.style.SUCCESS(
+                f'Database available! ({elapsed:.0f}ms round trip)'
+            ))
+            return
+
+    def probe(self):
+        """Run a query on the default database"""
+        connection = connections['default']
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except OperationalError:
+            # a broken connection would fail every later probe
+            if connection.connection is not None \
+                    and not connection.is_usable():
+                connection.close()
+            raise
@@ -0,0 +1,316 @@
+import bisect
+import contextlib
+import hmac
+import ipaddress
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from core.db.pool import all_pools
+from core.db.routers import replica_lag
+
+
+# content type of the prometheus text format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# upper bounds of the histogram buckets, in seconds and in queries
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# stats() keys that only ever grow, exported as counters so rate()
+# works on them; the other keys are gauges
+CACHE_COUNTERS = ('hits', 'misses', 'evictions')
+POOL_COUNTERS = (
+    'created', 'closed', 'checkouts', 'timeouts', 'failed_checks',
+    'checkout_seconds',
+)
+
+
+def format_value(value):
+    """Return a sample value as prometheus writes it"""
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def format_labels(labels):
+    """Return the {name="value",...} part of a sample"""
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    ) + '}'
+
+
+class Histogram:
+    """Distribution of observed values, per route
+
+    Each observation increments one bucket under a lock. The buckets
+    are only summed up when the metrics are exported.
+    """
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        # route -> [count of each bucket and of +Inf, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(route)
+            if series is None:
+                series = [0] * (len(self.buckets) + 1) + [0]
+                self._series[route] = series
+            series[index] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def export(self):
+        """Yield the lines of the histogram in the prometheus format"""
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            series = {route: list(s) for route, s in self._series.items()}
+        for route, counts in sorted(series.items()):
+            total = 0
+            bounds = [format_value(bound) for bound in self.buckets]
+            for bound, count in zip(bounds + ['+Inf'], counts):
+                total += count
+                labels = format_labels((('route', route), ('le', bound)))
+                yield f'{self.name}_bucket{labels} {total}'
+            labels = format_labels((('route', route),))
+            yield f'{self.name}_sum{labels} {format_value(counts[-1])}'
+            yield f'{self.name}_count{labels} {total}'
+
+
+request_seconds = Histogram(
+    'http_request_duration_seconds',
+    'Time to build the response, without streaming it.',
+    SECONDS_BUCKETS
+)
+request_queries = Histogram(
+    'http_request_queries',
+    'SQL queries run per request.',
+    QUERY_BUCKETS
+)
+request_db_seconds = Histogram(
+    'http_request_db_seconds',
+    'Time spent in SQL queries per request.',
+    SECONDS_BUCKETS
+)
+request_slowest_query_seconds = Histogram(
+    'http_request_slowest_query_seconds',
+    'Time of the slowest SQL query of each request.',
+    SECONDS_BUCKETS
+)
+request_view_seconds = Histogram(
+    'http_request_view_seconds',
+    'Time spent in the view, serializing and validating, outside SQL.',
+    SECONDS_BUCKETS
+)
+request_render_seconds = Histogram(
+    'http_request_render_seconds',
+    'Time spent rendering the response content, outside SQL.',
+    SECONDS_BUCKETS
+)
+
+HISTOGRAMS = (
+    request_seconds,
+    request_queries,
+    request_db_seconds,
+    request_slowest_query_seconds,
+    request_view_seconds,
+    request_render_seconds,
+)
+
+
+class RequestTimings:
+    """Where the time of a request went
+
+    It is installed as an execute wrapper on the database connections
+    for the duration of the request, timing every query. The view and
+    render times are measured by MetricsMiddleware, less the time of
+    the queries run meanwhile.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.slowest_query = 0.0
+        self.total = None
+        self.view = None
+        self.render = None
+        # (start time, db time at the start) of the phase being timed
+        self._phase = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db += elapsed
+            if elapsed > self.slowest_query:
+                self.slowest_query = elapsed
+
+    def start_phase(self):
+        self._phase = (time.perf_counter(), self.db)
+
+    def end_phase(self):
+        """Return the time since start_phase outside SQL queries"""
+        if self._phase is None:
+            return None
+        started, db = self._phase
+        self._phase = None
+        return time.perf_counter() - started - (self.db - db)
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Return the value of the Server-Timing header"""
+        timings = [
+            f'db;dur={self.db * 1e3:.1f};desc="{self.queries} queries"',
+            f'db-slowest;dur={self.slowest_query * 1e3:.1f}',
+        ]
+        if self.view is not None:
+            timings.append(f'view;dur={self.view * 1e3:.1f}')
+        if self.render is not None:
+            timings.append(f'render;dur={self.render * 1e3:.1f}')
+        timings.append(f'total;dur={self.total * 1e3:.1f}')
+        return ', '.join(timings)
+
+    def observe(self, route):
+        """Add the timings to the histograms of route"""
+        request_seconds.observe(route, self.total)
+        request_queries.observe(route, self.queries)
+        request_db_seconds.observe(route, self.db)
+        request_slowest_query_seconds.observe(route, self.slowest_query)
+        if self.view is not None:
+            request_view_seconds.observe(route, self.view)
+        if self.render is not None:
+            request_render_seconds.observe(route, self.render)
+
+
+class MetricsMiddleware:
+    """Time the queries, view and rendering of every request
+
+    The timings are sent in a Server-Timing header and added to the
+    histograms of the request's route, the name of the url pattern it
+    matched. It should be the first middleware, so the totals cover
+    the other ones.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = request.timings = RequestTimings()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            response = self.get_response(request)
+        if timings.view is None:
+            # responses that are not rendered end with the view
+            timings.view = timings.end_phase()
+        timings.finish()
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        # unresolved paths share a route, so scanners cannot add series
+        route = resolver_match.view_name if resolver_match else 'unmatched'
+        timings.observe(route)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timings.start_phase()
+
+    def process_template_response(self, request, response):
+        # called after the other middleware, just before rendering
+        timings = request.timings
+        timings.view = timings.end_phase()
+        timings.start_phase()
+
+        def rendered(response):
+            timings.render = timings.end_phase()
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def stats_lines(name, label, stats, counters=()):
+    """Yield the metrics of the stats() of several objects
+
+    stats maps the label value of each object to its stats, whose keys
+    become the metric names. The keys in counters are exported as
+    counters, with a _total suffix, the others as gauges.
+    """
+    by_key = {}
+    for value, object_stats in stats.items():
+        for key, number in object_stats.items():
+            by_key.setdefault(key, []).append((value, number))
+    for key, samples in sorted(by_key.items()):
+        if key in counters:
+            metric, kind = f'{name}_{key}_total', 'counter'
+        else:
+            metric, kind = f'{name}_{key}', 'gauge'
+        yield f'# TYPE {metric} {kind}'
+        for value, number in sorted(samples):
+            labels = format_labels(((label, value),))
+            yield f'{metric}{labels} {format_value(number)}'
+
+
+def scrape_allowed(request):
+    """Return whether request may read the metrics
+
+    The scraper either connects from one of METRICS_ALLOWED_NETWORKS
+    or, behind a proxy, sends METRICS_TOKEN as a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
+
+
+def export():
+    """Return the metrics of the process in the prometheus format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.export())
+    lines.extend(stats_lines('cache', 'cache', {
+        name: import_string(path).stats()
+        for name, path in settings.METRICS_CACHES.items()
+    }, CACHE_COUNTERS))
+    lines.extend(stats_lines('db_pool', 'alias', {
+        key[0]: pool.stats() for key, pool in all_pools().items()
+    }, POOL_COUNTERS))
+    lines.extend(stats_lines('db_replica', 'alias', {
+        alias: {'lag_seconds': lag}
+        for alias, lag in replica_lag.stats().items()
+    }))
+    return '\n'.join(lines) + '\n'
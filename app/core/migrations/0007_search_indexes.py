@@ -0,0 +1,37 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_updated_at'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        # full-text index on recipe titles. The expression must match
+        # the vector built by recipe.search.search_recipes
+        migrations.RunSQL(
+            "CREATE INDEX core_recipe_title_search ON core_recipe "
+            "USING gin (to_tsvector('english'::regconfig, "
+            "COALESCE(title, '')))",
+            'DROP INDEX core_recipe_title_search',
+        ),
+        # trigram indexes for fuzzy and substring matches
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_title_trgm ON core_recipe '
+            'USING gin (title gin_trgm_ops)',
+            'DROP INDEX core_recipe_title_trgm',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_tag_name_trgm ON core_tag '
+            'USING gin (name gin_trgm_ops)',
+            'DROP INDEX core_tag_name_trgm',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_ingredient_name_trgm ON core_ingredient '
+            'USING gin (name gin_trgm_ops)',
+            'DROP INDEX core_ingredient_name_trgm',
+        ),
+    ]
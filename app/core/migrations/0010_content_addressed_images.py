@@ -0,0 +1,20 @@
+# Generated by Django 2.1.15 on 2026-10-18 04:25
+
+import core.files
+import core.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=core.files.ContentAddressedImageField(db_index=True, null=True, storage=core.files.ContentAddressedStorage(), upload_to=core.models.recipe_image_file_path),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 2.1.15 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+# indexes serving assigned_only, which only lists the rows in use
+PARTIAL_INDEXES = (
+    ('core_tag', 'core_tag_user_assigned_idx'),
+    ('core_ingredient', 'core_ingredient_user_assigned_idx'),
+)
+
+# the counts of existing rows, from their relations
+COUNT_SQL = (
+    'UPDATE core_tag SET recipe_count = ('
+    'SELECT COUNT(*) FROM core_recipe_tags '
+    'WHERE core_recipe_tags.tag_id = core_tag.id)',
+    'UPDATE core_ingredient SET recipe_count = ('
+    'SELECT COUNT(*) FROM core_recipe_ingredients '
+    'WHERE core_recipe_ingredients.ingredient_id = core_ingredient.id)',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-recipe_count', 'name', 'id'], name='core_ingredient_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count', 'name', 'id'], name='core_tag_user_count_idx'),
+        ),
+        migrations.RunSQL(COUNT_SQL, migrations.RunSQL.noop),
+    ] + [
+        # partial indexes need a condition, which Index lacks before
+        # Django 2.2
+        migrations.RunSQL(
+            f'CREATE INDEX {name} ON {table} (user_id, name, id) '
+            'WHERE recipe_count > 0',
+            f'DROP INDEX {name}'
+        )
+        for table, name in PARTIAL_INDEXES
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.1.15 on 2026-10-18 09:12
+
+from django.db import migrations
+
+
+def mark_images_pending(apps, schema_editor):
+    """Queue the images uploaded before image_status existed
+
+    They were left with a blank status, which process_images never
+    selects, so their renditions would never be rendered.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.using(schema_editor.connection.alias).filter(
+        image_status=''
+    ).exclude(image='').update(image_status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_images_pending, migrations.RunPython.noop),
+    ]
@@ -2,15 +2,33 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager,\
                                         PermissionsMixin
 from django.conf import settings
+from core.files import ContentAddressedImageField, ContentAddressedStorage
 import uuid
 import os
 
 
+def recipe_image_path(filename):
+    """Return the storage path of a recipe image named filename
+
+    Images are spread over RECIPE_IMAGE_SHARD_LEVELS levels of
+    directories named after two characters of the filename each, so
+    no directory holds too many files.
+    """
+    levels = settings.RECIPE_IMAGE_SHARD_LEVELS
+    shards = [filename[level * 2:level * 2 + 2] for level in range(levels)]
+    return os.path.join('uploads/recipe/', *shards, filename)
+
+
 def recipe_image_file_path(instance, filename):
-    """Generate file path for new image"""
-    extension = filename.split('.')[-1]
-    filename = f'{uuid.uuid4()}.{extension}'
-    return os.path.join('uploads/recipe/', filename)
+    """Generate file path for new image
+
+    Images are named after the digest of their content when it is
+    known, so identical uploads end up in the same file.
+    """
+    extension = filename.split('.')[-1].lower()
+    digest = getattr(getattr(instance, 'image', None), 'digest', None)
+    filename = f'{digest or uuid.uuid4()}.{extension}'
+    return recipe_image_path(filename)
 
 
 class UserManager(BaseUserManager):
@@ -56,6 +74,24 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # number of recipes using the tag, kept up to date by
+    # recipe.signals. Rebuilt by the repair_recipe_counts command
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # a user's tags are listed by name, with the id breaking ties,
+        # or by the number of recipes using them
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_tag_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', '-recipe_count', 'name', 'id'],
+                name='core_tag_user_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -68,6 +104,24 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # number of recipes using the ingredient, kept up to date by
+    # recipe.signals. Rebuilt by the repair_recipe_counts command
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # a user's ingredients are listed by name, with the id breaking ties,
+        # or by the number of recipes using them
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_ingredient_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', '-recipe_count', 'name', 'id'],
+                name='core_ingredient_user_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -75,6 +129,16 @@ class Ingredient(models.Model):
 
 class Recipe(models.Model):
     """Recipe object"""
+    # progress of rendering the renditions of an uploaded image
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUSES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -90,7 +154,42 @@ class Recipe(models.Model):
     # the key model before we define the current model
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # images are shared by the recipes with identical uploads
+    image = ContentAddressedImageField(
+        null=True,
+        db_index=True,
+        upload_to=recipe_image_file_path,
+        storage=ContentAddressedStorage()
+    )
+    image_status = models.CharField(
+        max_length=10,
+        choices=IMAGE_STATUSES,
+        blank=True
+    )
+    # also refreshed when the recipe's tags or ingredients change,
+    # so it can validate cached copies of the recipe detail
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # a user's recipes are listed newest first
+        indexes = [
+            models.Index(
+                fields=['user', 'id'],
+                name='core_recipe_user_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class ImportCheckpoint(models.Model):
+    """Progress of a resumable recipe import"""
+    name = models.CharField(max_length=255, unique=True)
+    # number of input records already handled
+    position = models.BigIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,116 @@
+import asyncio
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.asgi import ThreadPoolASGIHandler
+from core.models import Recipe
+from core.tests.test_asgi import http_scope, run
+
+
+CLIENTS = 24
+REQUESTS_PER_CLIENT = 10
+# one client in EXPORT_EVERY exports its recipes rather than reading one
+EXPORT_EVERY = 8
+RECIPES = 2000
+
+
+def percentile(values, fraction):
+    """Return the value below which fraction of the values fall"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class ASGIBenchmark(TransactionTestCase):
+    """Compare latency under concurrent clients with ASGI and WSGI
+
+    Each client sends its requests one after the other. Most read a
+    recipe, a few export all of them. The WSGI baseline is a sync
+    worker, which serves a single request at a time, so a quick request
+    waits behind every export queued before it.
+    """
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(user=user, title=f'Recipe {i}', time_minutes=10, price=5)
+            for i in range(RECIPES)
+        )
+        token = Token.objects.create(user=user)
+        self.headers = [(b'authorization', f'Token {token.key}'.encode())]
+        self.detail_url = reverse(
+            'recipe:recipe-detail',
+            args=[recipes[0].id]
+        )
+        self.export_url = reverse('recipe:recipe-export')
+        self.addCleanup(connections.close_all)
+
+    async def run_client(self, app, url, latencies):
+        """Send the requests of a client, recording their latency"""
+        for _ in range(REQUESTS_PER_CLIENT):
+            received = asyncio.Queue()
+            received.put_nowait({'type': 'http.request', 'body': b''})
+            status = []
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            start = time.perf_counter()
+            await app(http_scope(url, headers=self.headers),
+                      received.get, send)
+            latencies.append(time.perf_counter() - start)
+            self.assertEqual(status, [200])
+
+    def measure(self, app):
+        """Return the elapsed time and latencies of the clients"""
+        latencies = {self.detail_url: [], self.export_url: []}
+        clients = [
+            self.export_url if i % EXPORT_EVERY == 0 else self.detail_url
+            for i in range(CLIENTS)
+        ]
+
+        async def load():
+            await asyncio.gather(*(
+                self.run_client(app, url, latencies[url]) for url in clients
+            ))
+
+        start = time.perf_counter()
+        run(load())
+        return time.perf_counter() - start, latencies
+
+    def report(self, name, elapsed, latencies):
+        total = sum(len(values) for values in latencies.values())
+        print(f'  {name:5} {total / elapsed:7.0f} requests/s')
+        for url, kind in ((self.detail_url, 'detail'),
+                          (self.export_url, 'export')):
+            values = latencies[url]
+            print(f'        {kind:6} p50 '
+                  f'{statistics.median(values) * 1e3:7.1f}ms  p99 '
+                  f'{percentile(values, 0.99) * 1e3:7.1f}ms')
+
+    def test_concurrent_clients(self):
+        wsgi = WSGIHandler()
+        # warm up the url resolver, caches and pooled connections
+        self.measure(ThreadPoolASGIHandler(wsgi))
+        with override_settings(
+            ASGI_THREADS=1,
+            ASGI_SLOW_PATHS=[],
+            ASGI_BACKLOG=CLIENTS
+        ):
+            sync_worker = ThreadPoolASGIHandler(wsgi)
+        asgi = ThreadPoolASGIHandler(wsgi)
+
+        print(f'\n{CLIENTS} clients x {REQUESTS_PER_CLIENT} requests, '
+              f'1 in {EXPORT_EVERY} exporting {RECIPES} recipes:')
+        self.report('wsgi', *self.measure(sync_worker))
+        self.report('asgi', *self.measure(asgi))
@@ -0,0 +1,52 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, modify_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+REQUESTS = 300
+
+
+class MetricsOverheadBenchmark(TestCase):
+    """Measure what timing the requests adds to each of them"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Curry',
+            time_minutes=10,
+            price=5
+        )
+        self.url = reverse('recipe:recipe-detail', args=[recipe.id])
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def seconds_per_request(self):
+        """Return the mean time of a recipe detail request"""
+        self.client.get(self.url)
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            self.client.get(self.url)
+        return (time.perf_counter() - start) / REQUESTS
+
+    def test_overhead(self):
+        without = timed = float('inf')
+        # alternate the runs, so both see the same state of the machine
+        for _ in range(5):
+            with modify_settings(MIDDLEWARE={
+                'remove': 'core.metrics.MetricsMiddleware',
+            }):
+                without = min(without, self.seconds_per_request())
+            timed = min(timed, self.seconds_per_request())
+        print(f'\n{REQUESTS} recipe detail requests:')
+        print(f'  without metrics {without * 1e6:7.0f}us per request')
+        print(f'  with metrics    {timed * 1e6:7.0f}us per request')
+        print(f'  overhead        {(timed - without) * 1e6:7.0f}us')
@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+REQUESTS = 200
+
+
+class ConnectionPoolBenchmark(TransactionTestCase):
+    """Compare requests per second with and without the connection pool
+
+    Django closes the connection at the end of every request, which is
+    repeated here, as the test client leaves it open.
+    """
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Curry',
+            time_minutes=10,
+            price=5
+        )
+        self.url = reverse('recipe:recipe-detail', args=[recipe.id])
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.settings_dict = connections['default'].settings_dict
+        self.addCleanup(
+            self.settings_dict.__setitem__,
+            'POOL',
+            self.settings_dict.get('POOL')
+        )
+
+    def requests_per_second(self, pool):
+        """Return the detail requests served per second"""
+        self.settings_dict['POOL'] = pool
+        connections.close_all()
+        self.client.get(self.url)
+        connections.close_all()
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            self.client.get(self.url)
+            connections.close_all()
+        return REQUESTS / (time.perf_counter() - start)
+
+    def test_pool_throughput(self):
+        without = self.requests_per_second(None)
+        pooled = self.requests_per_second({})
+        stats = connections['default'].pool.stats()
+        print(f'\n{REQUESTS} recipe detail requests:')
+        print(f'  connect per request {without:8.0f} requests/s')
+        print(f'  pooled              {pooled:8.0f} requests/s')
+        print(f'  pool: {stats["created"]} connections created, '
+              f'{stats["checkouts"]} checkouts, mean checkout '
+              f'{stats["checkout_seconds"] / stats["checkouts"] * 1e6:.0f}us')
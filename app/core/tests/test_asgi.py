@@ -0,0 +1,229 @@
+import asyncio
+import threading
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import SimpleTestCase, override_settings
+
+from core.asgi import ThreadPoolASGIHandler
+
+
+def run(coroutine):
+    """Run coroutine in a new event loop"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def http_scope(path, method='GET', headers=(), query_string=b''):
+    """Return the ASGI scope of an http request"""
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': query_string,
+        'headers': list(headers),
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 5000),
+    }
+
+
+def request(app, scope, body_chunks=(b'',)):
+    """Run a request through app and return the messages it sent"""
+    async def serve():
+        received = asyncio.Queue()
+        for i, chunk in enumerate(body_chunks):
+            received.put_nowait({
+                'type': 'http.request',
+                'body': chunk,
+                'more_body': i < len(body_chunks) - 1,
+            })
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await app(scope, received.get, send)
+        return sent
+
+    return run(serve())
+
+
+def echo_app(environ, start_response):
+    """WSGI application answering with parts of its environ"""
+    body = environ['wsgi.input'].read()
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [
+        environ['REQUEST_METHOD'].encode(), b' ',
+        environ['PATH_INFO'].encode('latin1'), b'?',
+        environ['QUERY_STRING'].encode(), b' ',
+        environ.get('HTTP_X_TOKEN', '').encode(), b' ',
+        environ['CONTENT_LENGTH'].encode(), b' ',
+        threading.current_thread().name.encode(), b'\n',
+        body,
+    ]
+
+
+def response_body(messages):
+    """Return the body sent in the response messages"""
+    return b''.join(
+        message['body'] for message in messages
+        if message['type'] == 'http.response.body'
+    )
+
+
+@override_settings(
+    ASGI_THREADS=2,
+    ASGI_SLOW_THREADS=1,
+    ASGI_SLOW_PATHS=[r'/export/$'],
+    ASGI_BACKLOG=1
+)
+class ThreadPoolASGIHandlerTests(SimpleTestCase):
+    """Test serving a WSGI application over ASGI"""
+
+    def test_request(self):
+        """Test the request reaches the application as a WSGI environ"""
+        app = ThreadPoolASGIHandler(echo_app)
+        messages = request(app, http_scope(
+            '/api/café/',
+            method='POST',
+            headers=[(b'x-token', b'a'), (b'x-token', b'b')],
+            query_string=b'q=1'
+        ), body_chunks=(b'hello ', b'world'))
+
+        self.assertEqual(messages[0]['type'], 'http.response.start')
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/plain'), messages[0]['headers'])
+        head, body = response_body(messages).split(b'\n')
+        self.assertEqual(
+            head.rsplit(b' ', 1)[0],
+            'POST /api/café/?q=1 a,b 11'.encode()
+        )
+        self.assertTrue(head.rsplit(b' ', 1)[1].startswith(b'asgi_'))
+        self.assertEqual(body, b'hello world')
+        self.assertFalse(messages[-1].get('more_body', False))
+
+    def test_cookie_headers_joined(self):
+        """Test cookies sent in several headers, as HTTP/2 does, are
+        joined like a single cookie header"""
+        def cookie_app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [environ['HTTP_COOKIE'].encode()]
+
+        app = ThreadPoolASGIHandler(cookie_app)
+        messages = request(app, http_scope('/', headers=[
+            (b'cookie', b'sessionid=a'),
+            (b'cookie', b'csrftoken=b'),
+        ]))
+
+        self.assertEqual(
+            response_body(messages),
+            b'sessionid=a; csrftoken=b'
+        )
+
+    @override_settings(ASGI_MAX_BODY_SIZE=10)
+    def test_body_too_large(self):
+        """Test bodies over the maximum size are rejected unread"""
+        app = ThreadPoolASGIHandler(echo_app)
+        declared = request(app, http_scope(
+            '/',
+            method='POST',
+            headers=[(b'content-length', b'11')]
+        ), body_chunks=(b'hello world',))
+        chunked = request(
+            app,
+            http_scope('/', method='POST'),
+            body_chunks=(b'hello ', b'world')
+        )
+        small = request(
+            app,
+            http_scope('/', method='POST'),
+            body_chunks=(b'hello',)
+        )
+
+        self.assertEqual(declared[0]['status'], 413)
+        self.assertEqual(chunked[0]['status'], 413)
+        self.assertEqual(small[0]['status'], 200)
+        self.assertEqual(app.pool.stats()['served'], 1)
+
+    def test_slow_paths(self):
+        """Test slow paths run in their own pool"""
+        app = ThreadPoolASGIHandler(echo_app)
+        messages = request(app, http_scope('/api/recipe/recipes/export/'))
+        self.assertIn(b' asgi-slow_', response_body(messages))
+        self.assertEqual(app.slow_pool.stats()['served'], 1)
+        self.assertEqual(app.pool.stats()['served'], 0)
+
+        with self.settings(ASGI_SLOW_PATHS=[]):
+            app = ThreadPoolASGIHandler(echo_app)
+        messages = request(app, http_scope('/api/recipe/recipes/export/'))
+        self.assertIn(b' asgi_', response_body(messages))
+
+    def test_backlog_full(self):
+        """Test requests beyond the backlog are turned away"""
+        app = ThreadPoolASGIHandler(echo_app)
+        app.pool.in_flight = app.pool.threads + app.pool.backlog
+        messages = request(app, http_scope('/'))
+
+        self.assertEqual(messages[0]['status'], 503)
+        self.assertIn((b'retry-after', b'1'), messages[0]['headers'])
+        self.assertEqual(app.pool.stats()['rejected'], 1)
+
+    def test_streaming_response_closed(self):
+        """Test a streamed response is sent in chunks and closed"""
+        closed = []
+
+        class Response:
+            def __iter__(self):
+                yield b'one'
+                yield b'two'
+
+            def close(self):
+                closed.append(threading.current_thread().name)
+
+        def streaming_app(environ, start_response):
+            start_response('200 OK', [])
+            return Response()
+
+        app = ThreadPoolASGIHandler(streaming_app)
+        messages = request(app, http_scope('/'))
+
+        self.assertEqual(
+            [message.get('body') for message in messages[1:]],
+            [b'one', b'two', b'']
+        )
+        # closed by the thread that ran the request
+        self.assertTrue(closed[0].startswith('asgi_'))
+
+    def test_django_application(self):
+        """Test the project is served through the handler"""
+        app = ThreadPoolASGIHandler(WSGIHandler())
+        messages = request(app, http_scope('/healthz'))
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(response_body(messages), b'ok')
+
+    def test_lifespan(self):
+        """Test the handler completes startup and shutdown"""
+        app = ThreadPoolASGIHandler(echo_app)
+
+        async def serve():
+            received = asyncio.Queue()
+            received.put_nowait({'type': 'lifespan.startup'})
+            received.put_nowait({'type': 'lifespan.shutdown'})
+            sent = []
+
+            async def send(message):
+                sent.append(message['type'])
+
+            await app({'type': 'lifespan'}, received.get, send)
+            return sent
+
+        self.assertEqual(
+            run(serve()),
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        )
@@ -0,0 +1,92 @@
+import warnings
+from unittest.mock import patch
+
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import TestCase
+
+from core.cache import LRUCache, DjangoCache, build_cache
+
+
+class LRUCacheTests(TestCase):
+
+    def test_get_and_set(self):
+        """Test values round trip and hits/misses are counted"""
+        cache = LRUCache()
+        self.assertIsNone(cache.get('missing'))
+        cache.set('key', {'id': 1})
+
+        self.assertEqual(cache.get('key'), {'id': 1})
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_values_are_copied(self):
+        """Test mutating a returned value does not change the cache"""
+        cache = LRUCache()
+        cache.set('key', [1, 2])
+        cache.get('key').append(3)
+        self.assertEqual(cache.get('key'), [1, 2])
+
+    def test_evicts_least_recently_used_by_size(self):
+        """Test the oldest unused entries are evicted when full"""
+        cache = LRUCache(max_bytes=300)
+        cache.set('a', 'a' * 100)
+        cache.set('b', 'b' * 100)
+        # reading a makes b the least recently used entry
+        cache.get('a')
+        cache.set('c', 'c' * 100)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertLessEqual(cache.stats()['bytes'], 300)
+
+    def test_oversized_value_not_stored(self):
+        """Test a value larger than the cache is not stored"""
+        cache = LRUCache(max_bytes=50)
+        cache.set('small', 'x')
+        cache.set('big', 'x' * 100)
+        self.assertIsNone(cache.get('big'))
+        self.assertEqual(cache.get('small'), 'x')
+
+    @patch('core.cache.time.monotonic')
+    def test_entries_expire(self, monotonic):
+        """Test entries are dropped once their ttl has passed"""
+        monotonic.return_value = 100
+        cache = LRUCache(ttl=10)
+        cache.set('key', 'value')
+
+        monotonic.return_value = 109
+        self.assertEqual(cache.get('key'), 'value')
+        monotonic.return_value = 110
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+
+class DjangoCacheTests(TestCase):
+
+    def test_shared_backend(self):
+        """Test the shared backend stores values in a Django cache"""
+        cache = build_cache({
+            'BACKEND': 'core.cache.DjangoCache',
+            'OPTIONS': {'alias': 'default', 'timeout': 60},
+        })
+        self.assertIsInstance(cache, DjangoCache)
+        cache.set('core-test-key', 0)
+
+        self.assertEqual(cache.get('core-test-key'), 0)
+        cache.delete('core-test-key')
+        self.assertIsNone(cache.get('core-test-key'))
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_long_key(self):
+        """Test keys too long for memcached are stored under a hash"""
+        cache = DjangoCache()
+        key = 'recipe-list:' + '&'.join(f'tags={i}' for i in range(40))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            cache.set(key, 1)
+            self.assertEqual(cache.get(key), 1)
+            cache.delete(key)
+            self.assertIsNone(cache.get(key))
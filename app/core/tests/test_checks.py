@@ -0,0 +1,34 @@
+from django.test import SimpleTestCase, override_settings
+
+from core import checks
+
+
+LOCAL_CACHES = {'default': {'BACKEND': checks.LOCAL_MEMORY_CACHE}}
+SHARED_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+    'LOCATION': 'memcached:11211',
+}}
+
+
+class SystemCheckTests(SimpleTestCase):
+    """Test the system checks of the deployment settings"""
+
+    @override_settings(CACHES=LOCAL_CACHES)
+    def test_local_data_version_cache(self):
+        """Test a per-process default cache fails the check"""
+        errors = checks.check_data_version_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_shared_data_version_cache(self):
+        """Test a shared default cache passes the check"""
+        self.assertEqual(checks.check_data_version_cache(None), [])
+
+    @override_settings(CACHES=LOCAL_CACHES, DATABASE_REPLICAS=['replica'])
+    def test_replicas_with_local_cache(self):
+        """Test replicas require a shared default cache"""
+        errors = checks.check_replica_sticky_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E002'])
+
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(checks.check_replica_sticky_cache(None), [])
@@ -1,43 +1,235 @@
 # allow us to mock behavior of django get database function.
 # simulate behavior when database is available and not
 # when we run our command
+import os
+import shutil
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 # allow us to call the command in the source code
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 # Error that django will throw when db is not available
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from core.models import Recipe, Tag, ImportCheckpoint
+from recipe.images import rendition_names
+
+
+ENSURE_CONNECTION = \
+    'django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection'
 
 
 class CommandTests(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
-        # whenever the __getitem__ method is called in the block,
-        # the code mocks/overrides the default connection handler
-        # and replace it with a mock object that returns what we want
-        # and monitors the number of calls being made to it
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as \
-                get_item:
-            # instruct this mock to always return true
-            get_item.return_value = True
+        # whenever ensure_connection is called in the block, the code
+        # mocks/overrides the connection's own method and replaces it
+        # with a mock object that monitors the number of calls made
+        with patch(ENSURE_CONNECTION) as ensure_connection:
+            out = StringIO()
             # wait_for_db is the command we will create
-            call_command('wait_for_db')
-            # access the call_count attribute for the object
-            self.assertEqual(get_item.call_count, 1)
+            call_command('wait_for_db', stdout=out)
+            # the database was actually queried
+            self.assertEqual(ensure_connection.call_count, 1)
+            self.assertIn('Database available!', out.getvalue())
 
     # Use patch as decorator. Essentially does the same thing as above,
     # overriding the default bahavor of a function. The mock object
     # will then be passed into the function we define below.
     # Here it's the time_sleep object that's analogous
-    # to get_item above. We patch time.sleep function
+    # to ensure_connection above. We patch time.sleep function
     # in order to save time here
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, time_sleep):
         """Test waiting for db until the db is ready"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as \
-                get_item:
-            # Make the __getitem__ method return Error the first five times
-            get_item.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(get_item.call_count, 6)
+        with patch(ENSURE_CONNECTION) as ensure_connection:
+            # Make connecting raise an error the first five times
+            ensure_connection.side_effect = [OperationalError] * 5 + [None]
+            call_command('wait_for_db', max_delay=0.5, stdout=StringIO())
+            self.assertEqual(ensure_connection.call_count, 6)
+
+        # the waits grow exponentially, with jitter, up to max_delay
+        waits = [call[0][0] for call in time_sleep.call_args_list]
+        self.assertEqual(len(waits), 5)
+        for wait, delay in zip(waits, (0.1, 0.2, 0.4, 0.5, 0.5)):
+            self.assertGreaterEqual(wait, delay / 2)
+            self.assertLessEqual(wait, delay)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_deadline(self, time_sleep):
+        """Test the command fails once the deadline has passed"""
+        with patch(ENSURE_CONNECTION) as ensure_connection:
+            ensure_connection.side_effect = OperationalError('refused')
+            with self.assertRaisesMessage(CommandError, 'refused'):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+
+class ImportRecipesTests(TestCase):
+    """Test the import_recipes command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+
+    def write_input(self, content, suffix='.jsonl'):
+        """Write content to a temporary file and return its path"""
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_recipes(self, path, **options):
+        """Run the command quietly and return its output"""
+        out = StringIO()
+        call_command(
+            'import_recipes',
+            path,
+            user=self.user.email,
+            stdout=out,
+            stderr=StringIO(),
+            **options
+        )
+        return out.getvalue()
+
+    def test_import_jsonl(self):
+        """Test recipes are imported with their tags and ingredients"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        path = self.write_input(
+            '{"title": "Curry", "time_minutes": 20, "price": "5.00", '
+            '"tags": ["Vegan", "Spicy"], "ingredients": ["Rice"]}\n'
+            '{"title": "Salad", "time_minutes": 5, "price": "3.50", '
+            '"tags": ["Vegan"]}\n'
+        )
+        self.import_recipes(path, batch_size=1)
+
+        curry = Recipe.objects.get(user=self.user, title='Curry')
+        self.assertEqual(
+            sorted(tag.name for tag in curry.tags.all()),
+            ['Spicy', 'Vegan']
+        )
+        self.assertEqual(curry.ingredients.get().name, 'Rice')
+        # existing tags are reused rather than created again
+        self.assertEqual(Tag.objects.filter(name='Vegan').count(), 1)
+        salad = Recipe.objects.get(title='Salad')
+        self.assertEqual(salad.tags.get().name, 'Vegan')
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'recipe_count')),
+            {'Vegan': 2, 'Spicy': 1}
+        )
+
+    def test_import_csv_skips_invalid(self):
+        """Test invalid csv records are skipped and the rest imported"""
+        path = self.write_input(
+            'title,time_minutes,price,link,tags,ingredients\n'
+            'Curry,20,5.00,,Vegan|Spicy,Rice\n'
+            ',20,5.00,,,\n'
+            'Soup,ten,5.00,,,\n',
+            suffix='.csv'
+        )
+        out = self.import_recipes(path)
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Curry')
+        self.assertEqual(recipe.tags.count(), 2)
+        self.assertIn('skipped 2', out)
+
+    def test_import_resumes(self):
+        """Test a rerun skips the records of committed batches"""
+        path = self.write_input(
+            '{"title": "Curry", "time_minutes": 20, "price": "5.00"}\n'
+            '{"title": "Salad", "time_minutes": 5, "price": "3.50"}\n'
+        )
+        ImportCheckpoint.objects.create(name='partner', position=1)
+
+        self.import_recipes(path, checkpoint='partner')
+        out = self.import_recipes(path, checkpoint='partner')
+
+        titles = Recipe.objects.values_list('title', flat=True)
+        self.assertEqual(list(titles), ['Salad'])
+        self.assertIn('already finished', out)
+
+
+class RepairRecipeCountsTests(TestCase):
+    """Test the repair_recipe_counts command"""
+
+    def test_repair_recipe_counts(self):
+        """Test wrong counts are rebuilt from the recipes"""
+        user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        tag = Tag.objects.create(user=user, name='Vegan')
+        unused = Tag.objects.create(user=user, name='Spicy')
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Curry',
+            time_minutes=20,
+            price=5
+        )
+        recipe.tags.add(tag)
+        Tag.objects.filter(pk=tag.pk).update(recipe_count=7)
+        Tag.objects.filter(pk=unused.pk).update(recipe_count=3)
+
+        out = StringIO()
+        call_command('repair_recipe_counts', batch_size=1, stdout=out)
+
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'recipe_count')),
+            {'Vegan': 1, 'Spicy': 0}
+        )
+        self.assertIn('Repaired 2 tags', out.getvalue())
+
+
+class ShardImagesTests(TestCase):
+    """Test the shard_images command"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+
+    def sample_recipe(self, image):
+        """Create a recipe using the image stored under name image"""
+        return Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=5.00,
+            image=image
+        )
+
+    @override_settings(RECIPE_IMAGE_SHARD_LEVELS=2)
+    def test_shard_images(self):
+        """Test flat images and their renditions are moved into shards"""
+        storage = Recipe._meta.get_field('image').storage
+        old = 'uploads/recipe/abcdef.jpg'
+        for name in (old, rendition_names(old)['thumbnail']):
+            storage.save(name, ContentFile(b'image'))
+        recipes = [self.sample_recipe(old), self.sample_recipe(old)]
+        missing = self.sample_recipe('uploads/recipe/012345.jpg')
+
+        call_command('shard_images', stdout=StringIO(), stderr=StringIO())
+
+        new = 'uploads/recipe/ab/cd/abcdef.jpg'
+        for recipe in recipes:
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.image.name, new)
+        self.assertTrue(storage.exists(new))
+        self.assertTrue(storage.exists(rendition_names(new)['thumbnail']))
+        self.assertFalse(storage.exists(old))
+        missing.refresh_from_db()
+        self.assertEqual(missing.image.name, 'uploads/recipe/012345.jpg')
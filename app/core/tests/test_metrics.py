@@ -0,0 +1,158 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+METRICS_URL = reverse('metrics')
+
+
+def sample_count(text, name, route):
+    """Return the value of a route's sample in exported metrics"""
+    match = re.search(
+        rf'^{name}{{route="{route}"}} (\S+)$',
+        text,
+        re.MULTILINE
+    )
+    return float(match.group(1)) if match else 0
+
+
+class HistogramTests(SimpleTestCase):
+    """Test the histograms of the metrics"""
+
+    def test_export(self):
+        """Test the buckets are exported cumulated"""
+        histogram = metrics.Histogram('latency', 'Latency.', (1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe('a"b', value)
+
+        self.assertEqual(list(histogram.export()), [
+            '# HELP latency Latency.',
+            '# TYPE latency histogram',
+            r'latency_bucket{route="a\"b",le="1"} 2',
+            r'latency_bucket{route="a\"b",le="5"} 3',
+            r'latency_bucket{route="a\"b",le="+Inf"} 4',
+            r'latency_sum{route="a\"b"} 14.5',
+            r'latency_count{route="a\"b"} 4',
+        ])
+
+
+class MetricsMiddlewareTests(TestCase):
+    """Test the requests are timed"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=10,
+            price=5
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing(self):
+        """Test the timings of the request are sent in a header"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, {'search': 'curry'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        timings = dict(
+            timing.split(';', 1)
+            for timing in res['Server-Timing'].split(', ')
+        )
+        self.assertEqual(
+            set(timings),
+            {'db', 'db-slowest', 'view', 'render', 'total'}
+        )
+        self.assertIn(
+            f'desc="{len(ctx.captured_queries)} queries"',
+            timings['db']
+        )
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        """Test the header can be turned off"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_route_histograms(self):
+        """Test the timings are added to the histograms of the route"""
+        before = self.client.get(METRICS_URL).content.decode()
+        self.client.get(RECIPE_URL)
+        self.client.get('/no/such/page')
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], metrics.CONTENT_TYPE)
+        after = res.content.decode()
+        for name in ('http_request_duration_seconds_count',
+                     'http_request_queries_count',
+                     'http_request_render_seconds_count'):
+            self.assertEqual(
+                sample_count(after, name, 'recipe:recipe-list'),
+                sample_count(before, name, 'recipe:recipe-list') + 1
+            )
+        self.assertEqual(
+            sample_count(after, 'http_request_duration_seconds_count',
+                         'unmatched'),
+            sample_count(before, 'http_request_duration_seconds_count',
+                         'unmatched') + 1
+        )
+
+    def test_stats_exported(self):
+        """Test the cache and connection pool stats are exported"""
+        content = self.client.get(METRICS_URL).content.decode()
+
+        for cache in ('response', 'fragment', 'token'):
+            self.assertIn(f'cache_hits_total{{cache="{cache}"}}', content)
+        self.assertIn('# TYPE cache_misses_total counter', content)
+        self.assertIn('# TYPE db_pool_checkouts_total counter', content)
+        self.assertIn('# TYPE db_pool_in_use gauge', content)
+
+
+class MetricsAccessTests(SimpleTestCase):
+    """Test only internal scrapers can read the metrics"""
+
+    def test_public_address_not_found(self):
+        """Test clients outside the allowed networks get a 404"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(METRICS_ALLOWED_NETWORKS=['10.0.0.0/8'])
+    def test_allowed_network(self):
+        """Test clients in an allowed network can read the metrics"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='10.1.2.3')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        """Test the token lets clients from any address in"""
+        res = self.client.get(
+            METRICS_URL,
+            REMOTE_ADDR='203.0.113.5',
+            HTTP_AUTHORIZATION='Bearer secret'
+        )
+        wrong = self.client.get(
+            METRICS_URL,
+            REMOTE_ADDR='203.0.113.5',
+            HTTP_AUTHORIZATION='Bearer wrong'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(wrong.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from core import models
 from unittest.mock import patch
@@ -73,11 +73,26 @@ class ModelTests(TestCase):
 
     # uuid4 function would normally generate unique uuid for imgs
     # here we override it to just return our specified
+    @override_settings(RECIPE_IMAGE_SHARD_LEVELS=2)
     @patch('uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
         """Test that image is saved in the correct location"""
         uuid = 'test-uuid'
         mock_uuid.return_value = uuid
         file_path = models.recipe_image_file_path(None, 'test_image.jpg')
-        expected_path = f'uploads/recipe/{uuid}.jpg'
+        expected_path = f'uploads/recipe/te/st/{uuid}.jpg'
         self.assertEqual(file_path, expected_path)
+
+    @override_settings(RECIPE_IMAGE_SHARD_LEVELS=2)
+    def test_recipe_file_name_digest(self):
+        """Test that images are named after their content when known"""
+        recipe = models.Recipe()
+        recipe.image.digest = 'abc123'
+        file_path = models.recipe_image_file_path(recipe, 'photo.JPG')
+        self.assertEqual(file_path, 'uploads/recipe/ab/c1/abc123.jpg')
+
+    @override_settings(RECIPE_IMAGE_SHARD_LEVELS=0)
+    def test_recipe_file_name_flat(self):
+        """Test that images can be stored in a single directory"""
+        file_path = models.recipe_image_path('abc123.jpg')
+        self.assertEqual(file_path, 'uploads/recipe/abc123.jpg')
@@ -0,0 +1,184 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+from psycopg2 import OperationalError, extensions
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.connection.broken:
+            raise OperationalError('server closed the connection')
+        self.connection.executed.append(sql)
+
+
+class FakeConnection:
+    """Stand-in for a psycopg2 connection"""
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.autocommit = True
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+        self.encoding = 'UTF8'
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def get_parameter_status(self, name):
+        return self.encoding if name == 'client_encoding' else None
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the pool hands out and takes back connections"""
+
+    def make_pool(self, **options):
+        """Return a pool of fake connections"""
+        return ConnectionPool(FakeConnection, **options)
+
+    def test_reuses_returned_connections(self):
+        """Test a returned connection is handed out again"""
+        pool = self.make_pool()
+        first = pool.checkout()
+        pool.checkin(first)
+
+        self.assertIs(pool.checkout(), first)
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_full_pool_times_out(self):
+        """Test checkouts fail once the pool stays full for the timeout"""
+        pool = self.make_pool(max_size=1, timeout=0.01)
+        pool.checkout()
+
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waiter_gets_returned_connection(self):
+        """Test a waiting checkout takes the next returned connection"""
+        pool = self.make_pool(max_size=1, timeout=5)
+        first = pool.checkout()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(
+            pool.checkout()
+        ))
+        waiter.start()
+        while not pool.stats()['waiters']:
+            time.sleep(0.001)
+
+        pool.checkin(first)
+        waiter.join()
+        self.assertEqual(result, [first])
+
+    def test_broken_idle_connection_replaced(self):
+        """Test a connection failing the health check is replaced"""
+        pool = self.make_pool(check_after=0)
+        first = pool.checkout()
+        pool.checkin(first)
+        first.broken = True
+
+        second = pool.checkout()
+
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_checkin_rolls_back(self):
+        """Test open transactions are rolled back on return and closed
+        connections dropped"""
+        pool = self.make_pool()
+        first, second = pool.checkout(), pool.checkout()
+        first.status = extensions.TRANSACTION_STATUS_INERROR
+        second.closed = 1
+
+        pool.checkin(first)
+        pool.checkin(second)
+
+        self.assertEqual(first.rollbacks, 1)
+        self.assertEqual(first.executed, ['DISCARD ALL'])
+        self.assertEqual(pool.stats()['idle'], 1)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    @patch('core.db.pool.time.monotonic')
+    def test_idle_connections_evicted(self, monotonic):
+        """Test connections idle too long are closed down to min_size"""
+        monotonic.return_value = 100
+        pool = self.make_pool(min_size=1, max_idle=10)
+        connections = [pool.checkout() for _ in range(3)]
+        for conn in connections:
+            pool.checkin(conn)
+
+        monotonic.return_value = 200
+        pool.checkout()
+
+        self.assertEqual(sum(conn.closed for conn in connections), 2)
+        self.assertEqual(pool.stats()['size'], 1)
+
+
+class PooledBackendTests(TestCase):
+    """Test the pooled backend keeps connections open"""
+
+    def test_close_returns_connection_to_pool(self):
+        """Test a closed connection is reused by the next connect"""
+        connection = connections['default']
+        settings_dict = dict(connection.settings_dict, POOL={})
+        wrapper = type(connection)(settings_dict)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        created = wrapper.pool.stats()['created']
+        wrapper.close()
+
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, raw)
+        wrapper.close()
+        self.assertEqual(wrapper.pool.stats()['created'], created)
+        self.assertFalse(raw.closed)
+
+    def test_checkin_discards_session_state(self):
+        """Test settings made by one checkout do not reach the next"""
+        connection = connections['default']
+        settings_dict = dict(connection.settings_dict, POOL={})
+        wrapper = type(connection)(settings_dict)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            default = cursor.fetchone()[0]
+            cursor.execute("SET statement_timeout = '1234ms'")
+        raw = wrapper.connection
+        wrapper.close()
+
+        with wrapper.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            timeout = cursor.fetchone()[0]
+        self.assertIs(wrapper.connection, raw)
+        wrapper.close()
+        self.assertEqual(timeout, default)
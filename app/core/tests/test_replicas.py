@@ -0,0 +1,144 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db.routers import ReplicaRouter, replica_lag, replica_reads
+from core.models import Tag
+from recipe.cache import response_cache
+from user.authentication import token_cache
+
+
+TAGS_URL = reverse('recipe:tag-list')
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Test safe requests read from the replica unless the client wrote
+
+    The replica is a second connection to the test database, and the
+    rows are committed, so it sees what the primary wrote.
+    """
+
+    def setUp(self):
+        connections.databases[REPLICA] = dict(
+            connections['default'].settings_dict
+        )
+        self.addCleanup(self.remove_replica)
+        for cache_ in (cache, response_cache, token_cache):
+            cache_.clear()
+        replica_lag.clear()
+
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        Tag.objects.create(user=self.user, name='Vegan')
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def remove_replica(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    def list_tags(self):
+        """List the tags, returning the queries run on each database"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            res = self.client.get(TAGS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return primary.captured_queries, replica.captured_queries
+
+    def test_safe_requests_read_from_replica(self):
+        """Test listing reads the tags from the replica"""
+        primary, replica = self.list_tags()
+
+        self.assertTrue(
+            any('core_tag' in query['sql'] for query in replica)
+        )
+        self.assertFalse(
+            any('core_tag' in query['sql'] for query in primary)
+        )
+
+    def test_replica_reads_not_cached(self):
+        """Test lists read from the replica are not cached or tagged
+
+        Another client of the same user does not stick to the primary
+        after a write, and must not store what a lagging replica
+        returned under the user's new data version.
+        """
+        self.list_tags()
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertNotIn('ETag', res)
+        self.assertEqual(response_cache.stats()['entries'], 0)
+
+        # lists read from the primary are still cached
+        self.client.post(TAGS_URL, {'name': 'Dessert'})
+        self.client.get(TAGS_URL)
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertIn('ETag', res)
+
+    def test_client_sticks_to_primary_after_write(self):
+        """Test a client reads its writes from the primary for a while"""
+        res = self.client.post(TAGS_URL, {'name': 'Dessert'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        primary, replica = self.list_tags()
+        self.assertTrue(
+            any('core_tag' in query['sql'] for query in primary)
+        )
+        self.assertFalse(
+            any('core_tag' in query['sql'] for query in replica)
+        )
+
+        # another client is not affected
+        token = Token.objects.create(user=get_user_model().objects.create_user(
+            'other@google.com',
+            'testpass'
+        ))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        primary, replica = self.list_tags()
+        self.assertTrue(
+            any('core_tag' in query['sql'] for query in replica)
+        )
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=2)
+    def test_lagging_replica_skipped(self):
+        """Test reads go to the primary while the replica lags"""
+        with patch.object(replica_lag, 'measure', return_value=10):
+            primary, replica = self.list_tags()
+
+        self.assertTrue(
+            any('core_tag' in query['sql'] for query in primary)
+        )
+        self.assertEqual(replica_lag.stats(), {REPLICA: 10})
+
+    def test_lag_measured(self):
+        """Test the lag of a server that is not replaying is zero"""
+        self.assertEqual(replica_lag.measure(REPLICA), 0)
+
+    def test_writes_go_to_primary(self):
+        """Test objects read from the replica are saved to the primary"""
+        router = ReplicaRouter()
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Tag), REPLICA)
+            tag = Tag.objects.get()
+            self.assertEqual(tag._state.db, REPLICA)
+            self.assertEqual(router.db_for_write(Tag, instance=tag),
+                             'default')
+            # tokens are read from the primary, see PRIMARY_APPS
+            self.assertEqual(router.db_for_read(Token), 'default')
+        self.assertEqual(router.db_for_read(Tag), 'default')
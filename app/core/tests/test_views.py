@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from core import views
+
+
+HEALTHZ_URL = reverse('healthz')
+READYZ_URL = reverse('readyz')
+
+
+class HealthViewTests(TestCase):
+    """Test the liveness and readiness probes"""
+
+    def setUp(self):
+        readiness = views.ReadinessCheck(ttl=60)
+        patcher = patch.object(views, 'readiness', readiness)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_healthz(self):
+        """Test the liveness probe answers without a query"""
+        with self.assertNumQueries(0):
+            res = self.client.get(HEALTHZ_URL)
+        self.assertEqual(res.status_code, 200)
+
+    def test_readyz(self):
+        """Test the readiness probe checks the database once per ttl"""
+        res = self.client.get(READYZ_URL)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['database'], 'ok')
+        self.assertEqual(res.json()['migrations'], 'ok')
+
+        with self.assertNumQueries(0):
+            res = self.client.get(READYZ_URL)
+        self.assertEqual(res.status_code, 200)
+
+    def test_readyz_database_unavailable(self):
+        """Test the probe fails while the database is unreachable"""
+        with patch(
+            'django.db.backends.base.base.BaseDatabaseWrapper.'
+            'ensure_connection',
+            side_effect=OperationalError('refused')
+        ), self.assertLogs('core.views'):
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json(), {'database': 'unavailable'})
+
+    def test_readyz_unapplied_migrations(self):
+        """Test the probe fails until all migrations are applied"""
+        with patch(
+            'core.views.MigrationExecutor.migration_plan',
+            return_value=[('migration', False)]
+        ):
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['migrations'], '1 unapplied')
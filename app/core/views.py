@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import DatabaseError
+from django.http import Http404, HttpResponse, JsonResponse
+
+from core.metrics import CONTENT_TYPE, export, scrape_allowed
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReadinessCheck:
+    """Database round trip and migration state, checked at most every
+    `ttl` seconds
+
+    Probes arriving while a check runs get the previous result rather
+    than queueing up behind it. Once every migration is applied the
+    migration graph is not loaded again, as the code of a running
+    process does not change.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.result = None
+        self.checked_at = None
+        self.migrated = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return (ready, details) from the last check, renewing it when
+        it is older than the ttl"""
+        fresh = self.checked_at is not None and \
+            time.monotonic() - self.checked_at < self.ttl
+        if fresh:
+            return self.result
+        # block only when there is no earlier result to hand out
+        if self._lock.acquire(blocking=self.result is None):
+            try:
+                self.result = self.check()
+                self.checked_at = time.monotonic()
+            finally:
+                self._lock.release()
+        return self.result
+
+    def check(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        try:
+            start = time.monotonic()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            details = {
+                'database': 'ok',
+                'database_ms': round((time.monotonic() - start) * 1000, 1),
+            }
+            if not self.migrated:
+                executor = MigrationExecutor(connection)
+                plan = executor.migration_plan(
+                    executor.loader.graph.leaf_nodes()
+                )
+                self.migrated = not plan
+                if plan:
+                    details['migrations'] = f'{len(plan)} unapplied'
+                    return False, details
+            details['migrations'] = 'ok'
+            return True, details
+        except DatabaseError:
+            # the error may name hosts, it is only logged
+            logger.exception('Readiness check failed')
+            return False, {'database': 'unavailable'}
+
+
+readiness = ReadinessCheck(settings.READINESS_CACHE_SECONDS)
+
+
+def healthz(request):
+    """Liveness probe: the process is serving requests"""
+    return HttpResponse('ok', content_type='text/plain')
+
+
+def readyz(request):
+    """Readiness probe: the database is reachable and migrated"""
+    ready, details = readiness.get()
+    return JsonResponse(details, status=200 if ready else 503)
+
+
+def metrics(request):
+    """Prometheus metrics of the process, for internal scrapers only"""
+    if not scrape_allowed(request):
+        # do not let the public know the endpoint exists
+        raise Http404
+    return HttpResponse(export(), content_type=CONTENT_TYPE)
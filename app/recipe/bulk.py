@@ -0,0 +1,145 @@
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.cache import invalidate_user_cache
+from recipe.counts import refresh_recipe_counts
+
+
+# most recipes a single bulk request may write
+MAX_BULK_ITEMS = 1000
+
+# plain columns written by a bulk request
+RECIPE_FIELDS = ('title', 'time_minutes', 'price', 'link')
+
+# relation name, model and through table column of each m2m field
+RELATIONS = (
+    ('tags', Tag, 'tag_id'),
+    ('ingredients', Ingredient, 'ingredient_id'),
+)
+
+DOES_NOT_EXIST = PrimaryKeyRelatedField.default_error_messages[
+    'does_not_exist'
+]
+
+
+def unique(values):
+    """Return values without duplicates, keeping their order"""
+    return list(dict.fromkeys(values))
+
+
+def check_items(user, items):
+    """Return a list of errors for items, aligned with items
+
+    Every tag, ingredient and recipe id referenced by the batch is
+    looked up with one query per type, scoped to the user, instead of
+    one query per id.
+    """
+    errors = [{} for item in items]
+
+    for field, model, column in RELATIONS:
+        ids = {pk for item in items for pk in item.get(field, ())}
+        if not ids:
+            continue
+        found = set(model.objects.filter(
+            user=user,
+            id__in=ids
+        ).values_list('id', flat=True))
+        for item, item_errors in zip(items, errors):
+            missing = [pk for pk in item.get(field, ()) if pk not in found]
+            if missing:
+                item_errors[field] = [
+                    DOES_NOT_EXIST.format(pk_value=pk) for pk in missing
+                ]
+
+    ids = [item['id'] for item in items if 'id' in item]
+    if ids:
+        found = set(Recipe.objects.filter(
+            user=user,
+            id__in=ids
+        ).values_list('id', flat=True))
+        seen = set()
+        for item, item_errors in zip(items, errors):
+            if 'id' not in item:
+                continue
+            if item['id'] not in found:
+                item_errors['id'] = ['Not found.']
+            elif item['id'] in seen:
+                item_errors['id'] = ['Recipe is listed more than once.']
+            seen.add(item['id'])
+
+    return errors
+
+
+def _update_recipes(items):
+    """Write the plain fields of existing recipes in one query"""
+    values = {}
+    for name in RECIPE_FIELDS:
+        field = Recipe._meta.get_field(name)
+        values[name] = Case(
+            *(
+                # parameters are sent untyped, so cast them to the column
+                When(pk=item['id'], then=Cast(
+                    Value(item.get(name, field.get_default())),
+                    output_field=field
+                ))
+                for item in items
+            ),
+            output_field=field
+        )
+    Recipe.objects.filter(pk__in=[item['id'] for item in items]).update(
+        updated_at=timezone.now(),
+        **values
+    )
+
+
+def write_items(user, items):
+    """Create or replace the recipes described by validated items
+
+    Items with an id replace that recipe, the others are created. The
+    recipes are inserted with one query and their relations rewritten
+    with one delete and one insert per relation, all in a single
+    transaction. Bulk writes send no model signals, so the recipe
+    counts of the tags and ingredients are refreshed and the user's
+    cached responses invalidated here. Returns the recipe ids in
+    the order of items.
+    """
+    with transaction.atomic():
+        created = Recipe.objects.bulk_create([
+            Recipe(user=user, **{
+                name: item[name] for name in RECIPE_FIELDS if name in item
+            })
+            for item in items if 'id' not in item
+        ])
+        created_ids = iter(recipe.id for recipe in created)
+        ids = [
+            item['id'] if 'id' in item else next(created_ids)
+            for item in items
+        ]
+
+        updated = [item for item in items if 'id' in item]
+        if updated:
+            _update_recipes(updated)
+
+        for field, model, column in RELATIONS:
+            through = getattr(Recipe, field).through
+            counted = {pk for item in items for pk in item.get(field, ())}
+            if updated:
+                replaced = through.objects.filter(
+                    recipe_id__in=[item['id'] for item in updated]
+                )
+                # the objects losing a replaced recipe need recounting too
+                counted.update(replaced.values_list(column, flat=True))
+                replaced.delete()
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{column: pk})
+                for recipe_id, item in zip(ids, items)
+                for pk in unique(item.get(field, ()))
+            ])
+            refresh_recipe_counts(model, counted)
+
+        invalidate_user_cache(user.pk)
+    return ids
@@ -0,0 +1,44 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import build_cache
+
+
+# cache for the list endpoint responses of the recipe API
+response_cache = build_cache(settings.RECIPE_RESPONSE_CACHE)
+
+
+def _version_key(user_id):
+    return f'recipe:data-version:{user_id}'
+
+
+def get_data_version(user_id):
+    """Return the current version of a user's recipe data
+
+    Versions are random tokens rather than counters, so a version
+    that gets evicted from the cache is replaced by one that no
+    cached response was ever stored under.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # another process may have created the version in the meantime
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(user_id):
+    """Invalidate every cached response of a user in one write"""
+    cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def invalidate_user_cache(user_id):
+    """Bump the data version of a user"""
+    bump_data_version(user_id)
+    # bump again once the change is visible to other connections, so
+    # a response computed before the commit cannot outlive it
+    transaction.on_commit(lambda: bump_data_version(user_id))
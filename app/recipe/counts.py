@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.models import Tag, Ingredient, Recipe
+
+
+# recipe relation and through table column of each counted model
+COUNTED_RELATIONS = {
+    Tag: ('tags', 'tag_id'),
+    Ingredient: ('ingredients', 'ingredient_id'),
+}
+
+
+def recipe_count_subquery(model):
+    """Return a subquery counting the recipes using an outer row"""
+    field, column = COUNTED_RELATIONS[model]
+    through = getattr(Recipe, field).through
+    return Coalesce(
+        Subquery(
+            through.objects.filter(**{column: OuterRef('pk')}).order_by(
+            ).values(column).annotate(count=Count('id')).values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def refresh_recipe_counts(model, ids=None):
+    """Recount the recipes using the tags or ingredients with ids
+
+    The count is taken from the relation in the same UPDATE that
+    writes it, so it is exact within the current transaction however
+    the relation was changed. Every row is recounted when ids is None.
+    Returns the number of rows updated.
+
+    The rows are locked first, in a statement of their own. An UPDATE
+    that waits for a row lock still counts from the snapshot it started
+    with, so it would miss the relations committed by the transaction
+    it waited for. Locking beforehand makes the UPDATE start after
+    that transaction committed. Locking in pk order keeps concurrent
+    recounts from deadlocking.
+    """
+    queryset = model.objects.all()
+    if ids is not None:
+        ids = set(ids)
+        if not ids:
+            return 0
+        queryset = queryset.filter(pk__in=ids)
+    # the locks are held until the caller's transaction ends
+    with transaction.atomic(savepoint=False):
+        list(queryset.select_for_update().order_by('pk').values_list(
+            'pk',
+            flat=True
+        ))
+        return queryset.update(recipe_count=recipe_count_subquery(model))
@@ -0,0 +1,120 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from core.models import Recipe
+
+
+# plain recipe columns written to an export, followed by the names of
+# the recipe's tags and ingredients
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+EXPORT_COLUMNS = EXPORT_FIELDS + ('tags', 'ingredients')
+
+# separator of the tag and ingredient names in a csv cell, and the
+# character escaping it, or itself, within a name
+CSV_LIST_SEPARATOR = '|'
+CSV_LIST_ESCAPE = '\\'
+
+
+def join_names(names):
+    """Return names as a csv cell, escaping the separator in them"""
+    return CSV_LIST_SEPARATOR.join(
+        name.replace(CSV_LIST_ESCAPE, CSV_LIST_ESCAPE * 2)
+        .replace(CSV_LIST_SEPARATOR, CSV_LIST_ESCAPE + CSV_LIST_SEPARATOR)
+        for name in names
+    )
+
+
+def split_names(cell):
+    """Return the names of a csv cell written by join_names"""
+    names = []
+    name = []
+    chars = iter(cell)
+    for char in chars:
+        if char == CSV_LIST_ESCAPE:
+            name.append(next(chars, ''))
+        elif char == CSV_LIST_SEPARATOR:
+            names.append(''.join(name))
+            name = []
+        else:
+            name.append(char)
+    names.append(''.join(name))
+    return names
+
+
+def _related_names(field, column, recipe_ids):
+    """Return the related names of each recipe, keyed by recipe id"""
+    names = {}
+    rows = getattr(Recipe, field).through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', f'{column}__name').order_by(f'{column}__name')
+    for recipe_id, name in rows:
+        names.setdefault(recipe_id, []).append(name)
+    return names
+
+
+def export_rows(queryset, chunk_size):
+    """Yield the recipes of queryset as dicts, one chunk at a time
+
+    The recipes are read through a server side cursor and the names of
+    their tags and ingredients loaded with one query per chunk, so only
+    a single chunk is held in memory however large the library is.
+    """
+    rows = queryset.values(*EXPORT_FIELDS).order_by('id').iterator(
+        chunk_size=chunk_size
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        recipe_ids = [row['id'] for row in chunk]
+        tags = _related_names('tags', 'tag', recipe_ids)
+        ingredients = _related_names('ingredients', 'ingredient', recipe_ids)
+        for row in chunk:
+            row['tags'] = tags.get(row['id'], [])
+            row['ingredients'] = ingredients.get(row['id'], [])
+            yield row
+
+
+def _in_transaction(rows):
+    """Iterate rows inside a transaction
+
+    Outside of a transaction the cursor is declared WITH HOLD, and
+    postgres then runs the whole query before the first row is sent.
+    """
+    with transaction.atomic():
+        yield from rows
+
+
+class Echo:
+    """File-like object returning what is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(rows):
+    """Yield rows as newline delimited json"""
+    for row in _in_transaction(rows):
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def csv_lines(rows):
+    """Yield a header line, then rows as csv"""
+    writer = csv.writer(Echo())
+    # sent before the query runs, so the download starts right away
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in _in_transaction(rows):
+        row['tags'] = join_names(row['tags'])
+        row['ingredients'] = join_names(row['ingredients'])
+        yield writer.writerow(row[column] for column in EXPORT_COLUMNS)
+
+
+# content type and line generator of each export type
+EXPORT_TYPES = {
+    'ndjson': ('application/x-ndjson', ndjson_lines),
+    'csv': ('text/csv', csv_lines),
+}
@@ -0,0 +1,94 @@
+import json
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core.cache import build_cache
+
+
+# cache of the encoded json of single recipes, see fragment_key
+fragment_cache = build_cache(settings.RECIPE_FRAGMENT_CACHE)
+
+# representations cached per recipe: the list and the detail one
+FRAGMENT_KINDS = ('list', 'detail')
+
+renderer = JSONRenderer()
+
+
+def fragment_key(kind, recipe_id):
+    """Return the cache key of a recipe's representation
+
+    The entries hold the recipe version they were rendered from, so an
+    outdated entry is never served even if it was not deleted.
+    """
+    return f'recipe-fragment:{kind}:{recipe_id}'
+
+
+def get_fragment(kind, recipe_id, version):
+    """Return the cached json of a recipe version, or None"""
+    entry = fragment_cache.get(fragment_key(kind, recipe_id))
+    if entry is None or entry[0] != version:
+        return None
+    return entry[1]
+
+
+def set_fragment(kind, recipe_id, version, content):
+    """Store the json of a recipe version"""
+    fragment_cache.set(fragment_key(kind, recipe_id), (version, content))
+
+
+def delete_fragments(recipe_ids):
+    """Drop every cached representation of the recipes"""
+    for recipe_id in recipe_ids:
+        for kind in FRAGMENT_KINDS:
+            fragment_cache.delete(fragment_key(kind, recipe_id))
+
+
+def encode(data):
+    """Return data encoded as the JSON renderer would encode it"""
+    return renderer.render(data)
+
+
+def encode_page(next_link, fragments):
+    """Return the json of a page joined from encoded results"""
+    # the renderer turns None into an empty body rather than null
+    next_json = b'null' if next_link is None else encode(next_link)
+    return b''.join((
+        b'{"next":', next_json,
+        b',"results":[', b','.join(fragments), b']}',
+    ))
+
+
+class PrerenderedResponse(Response):
+    """Response whose json content was encoded up front
+
+    The json is sent as is. Other renderers, and code reading .data,
+    get the data parsed back from the json on first use.
+    """
+
+    def __init__(self, content, **kwargs):
+        self.prerendered = content
+        super().__init__(None, **kwargs)
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = json.loads(self.prerendered.decode())
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    @property
+    def rendered_content(self):
+        accepted_renderer = getattr(self, 'accepted_renderer', None)
+        media_type = getattr(self, 'accepted_media_type', None) or ''
+        # clients may ask for indented json
+        if type(accepted_renderer) is not JSONRenderer or \
+                'indent' in media_type:
+            return super().rendered_content
+        self['Content-Type'] = self.content_type or \
+            accepted_renderer.media_type
+        return self.prerendered
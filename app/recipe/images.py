@@ -0,0 +1,181 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from core.files import lock_file_name
+from core.models import Recipe
+from recipe import imaging
+from recipe.cache import invalidate_user_cache
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_backlog = None
+_executor_lock = threading.Lock()
+
+
+def rendition_names(image_name):
+    """Return the storage name of each rendition of an image"""
+    root, extension = os.path.splitext(image_name)
+    return {
+        rendition: f'{root}.{rendition}.jpg'
+        for rendition in settings.RECIPE_IMAGE_RENDITIONS
+    }
+
+
+def rendition_urls(recipe, request=None):
+    """Return the url of each rendition of a recipe's image"""
+    if not recipe.image or recipe.image_status != Recipe.IMAGE_READY:
+        return {}
+    urls = {}
+    for rendition, name in rendition_names(recipe.image.name).items():
+        url = recipe.image.storage.url(name)
+        # absolute like the image url DRF renders next to it
+        urls[rendition] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def image_lookup(name):
+    """Return the lookup of the recipe image a stored file belongs to
+
+    name is either an image or one of its renditions.
+    """
+    root, extension = os.path.splitext(name)
+    image_root, dot, rendition = root.rpartition('.')
+    if dot and rendition in settings.RECIPE_IMAGE_RENDITIONS:
+        return {'image__startswith': f'{image_root}.'}
+    return {'image': name}
+
+
+def is_rendered(recipe):
+    """Return whether another recipe's copy of the image is rendered
+
+    Identical uploads share their file and so their renditions too.
+    """
+    return Recipe.objects.filter(
+        image=recipe.image.name,
+        image_status=Recipe.IMAGE_READY
+    ).exclude(pk=recipe.pk).exists()
+
+
+def release_image(image):
+    """Delete an image file and its renditions once no recipe uses it
+
+    Run after the change dropping the reference has been committed.
+    Uploads of the same image lock its name until they are committed,
+    so the check sees them, or they store the file again after it was
+    deleted.
+    """
+    if not image:
+        return
+    with transaction.atomic():
+        lock_file_name(image.name, DEFAULT_DB_ALIAS)
+        if Recipe.objects.filter(image=image.name).exists():
+            return
+        for name in (image.name, *rendition_names(image.name).values()):
+            image.storage.delete(name)
+
+
+def _render_args(image):
+    """Return the arguments rendering the renditions of image"""
+    storage = image.storage
+    return storage.path(image.name), [
+        (storage.path(name), settings.RECIPE_IMAGE_RENDITIONS[rendition])
+        for rendition, name in rendition_names(image.name).items()
+    ]
+
+
+def _set_status(recipe_id, user_id, image_name, image_status):
+    """Record the outcome of rendering an image
+
+    Nothing is changed if the recipe got another image in the meantime.
+    """
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_status=image_status,
+        updated_at=timezone.now()
+    )
+    if updated:
+        invalidate_user_cache(user_id)
+
+
+def render_recipe_image(recipe):
+    """Render the renditions of a recipe's image in this process"""
+    try:
+        imaging.render(*_render_args(recipe.image))
+        image_status = Recipe.IMAGE_READY
+    except Exception:
+        logger.exception('Rendering the image of recipe %s failed', recipe.pk)
+        image_status = Recipe.IMAGE_FAILED
+    _set_status(recipe.pk, recipe.user_id, recipe.image.name, image_status)
+
+
+def _get_executor():
+    """Return the pool of image workers, starting it on first use"""
+    global _executor, _backlog
+    with _executor_lock:
+        if _executor is None:
+            # spawn fresh workers rather than fork a process whose other
+            # threads may hold locks or database connections
+            _executor = ProcessPoolExecutor(
+                settings.RECIPE_IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _backlog = threading.BoundedSemaphore(
+                settings.RECIPE_IMAGE_BACKLOG
+            )
+    return _executor
+
+
+def _rendered(recipe_id, user_id, image_name, future):
+    """Record the outcome of rendering an image in a worker"""
+    _backlog.release()
+    try:
+        if future.exception() is not None:
+            logger.error(
+                'Rendering the image of recipe %s failed',
+                recipe_id,
+                exc_info=future.exception()
+            )
+            image_status = Recipe.IMAGE_FAILED
+        else:
+            image_status = Recipe.IMAGE_READY
+        _set_status(recipe_id, user_id, image_name, image_status)
+    except Exception:
+        logger.exception('Updating the image of recipe %s failed', recipe_id)
+    finally:
+        # callbacks run on a thread of the pool, outside of any request
+        # that would close the connection it opened
+        connections.close_all()
+
+
+def schedule_renditions(recipe):
+    """Render the renditions of a recipe's image in the background
+
+    The request returns without waiting for the workers. When more
+    images than the backlog allows are waiting already, the recipe is
+    left pending for the process_images command.
+    """
+    if settings.RECIPE_IMAGE_WORKERS <= 0:
+        render_recipe_image(recipe)
+        return
+    executor = _get_executor()
+    if not _backlog.acquire(blocking=False):
+        logger.warning('Image backlog full, recipe %s left pending', recipe.pk)
+        return
+    try:
+        future = executor.submit(imaging.render, *_render_args(recipe.image))
+    except Exception:
+        _backlog.release()
+        logger.exception('Queueing the image of recipe %s failed', recipe.pk)
+        return
+    future.add_done_callback(
+        partial(_rendered, recipe.pk, recipe.user_id, recipe.image.name)
+    )
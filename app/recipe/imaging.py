@@ -0,0 +1,63 @@
+# imported by the image worker processes, so keep Django out of here
+import os
+
+from PIL import Image, ImageOps
+
+
+# EXIF tag holding the orientation of the camera
+ORIENTATION_TAG = 274
+
+# transpositions turning an image stored in each EXIF orientation upright
+ORIENTATIONS = {
+    2: (Image.FLIP_LEFT_RIGHT,),
+    3: (Image.ROTATE_180,),
+    4: (Image.FLIP_TOP_BOTTOM,),
+    5: (Image.ROTATE_90, Image.FLIP_TOP_BOTTOM),
+    6: (Image.ROTATE_270,),
+    7: (Image.ROTATE_270, Image.FLIP_TOP_BOTTOM),
+    8: (Image.ROTATE_90,),
+}
+
+
+def upright(image):
+    """Return image rotated as the camera recorded it was held
+
+    Saving an image drops its EXIF data, orientation included, so the
+    rotation has to be applied to the pixels first.
+    """
+    try:
+        exif = image._getexif() or {}
+    except (AttributeError, IndexError, SyntaxError, KeyError):
+        # not a JPEG, or corrupt EXIF data
+        exif = {}
+    for method in ORIENTATIONS.get(exif.get(ORIENTATION_TAG), ()):
+        image = image.transpose(method)
+    return image
+
+
+def render(source_path, renditions):
+    """Write each rendition of the image at source_path
+
+    renditions is a list of (path, options) pairs, where options hold
+    the size, crop and quality of the rendition. The renditions are
+    written as JPEGs, which carry no metadata unless asked to.
+    """
+    with Image.open(source_path) as original:
+        image = upright(original)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        for path, options in renditions:
+            size = tuple(options['size'])
+            if options.get('crop'):
+                rendition = ImageOps.fit(image, size, Image.LANCZOS)
+            else:
+                rendition = image.copy()
+                rendition.thumbnail(size, Image.LANCZOS)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            rendition.save(
+                path,
+                'JPEG',
+                quality=options.get('quality', 85),
+                optimize=True
+            )
@@ -0,0 +1,148 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.negotiation import BaseContentNegotiation
+
+
+# files are named after their content or a random uuid, so a name is
+# never reused for other bytes and clients may cache them for a year.
+# private, as only the owners of the recipes may see them
+CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+class IgnoreAcceptNegotiation(BaseContentNegotiation):
+    """Content negotiation for views that do not render their content
+
+    Browsers ask for images with Accept headers none of the renderers
+    match, which would otherwise fail with 406 Not Acceptable.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+def parse_range(header, size):
+    """Return the first and last byte of a single range request
+
+    Returns None when the whole file should be sent, and raises
+    ValueError when the range lies outside the file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        # multiple ranges or an unknown unit, the whole file will do
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # the last bytes of the file
+        start, end = max(size - int(last), 0), size - 1
+        if not int(last):
+            raise ValueError('empty suffix range')
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('unsatisfiable range')
+    return start, end
+
+
+def read_range(path, start, length):
+    """Yield length bytes of the file at path from start"""
+    with open(path, 'rb') as stream:
+        stream.seek(start)
+        while length > 0:
+            chunk = stream.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def offload_response(name, path):
+    """Return a response handing the file over to the front proxy"""
+    header = settings.MEDIA_OFFLOAD_HEADER
+    content_type, encoding = mimetypes.guess_type(path)
+    response = HttpResponse(
+        content_type=content_type or 'application/octet-stream'
+    )
+    if header.lower() == 'x-accel-redirect':
+        response[header] = quote(settings.MEDIA_OFFLOAD_PREFIX + name)
+    else:
+        response[header] = path
+    return response
+
+
+def etag_for(path):
+    """Return the entity tag of a stored media file"""
+    return quote_etag(os.path.basename(path))
+
+
+def file_response(request, path):
+    """Return the file at path, or the byte range requested of it"""
+    size = os.path.getsize(path)
+    content_type, encoding = mimetypes.guess_type(path)
+    header = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    byte_range = None
+    if header and (if_range is None or if_range == etag_for(path)):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        # FileResponse hands the open file to the server's
+        # wsgi.file_wrapper, which can send it with sendfile()
+        response = FileResponse(open(path, 'rb'))
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(path, start, end - start + 1),
+            status=206,
+            content_type=content_type or 'application/octet-stream'
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def media_response(request, name, path):
+    """Return the media file stored at path under name
+
+    The file is served by the front proxy when MEDIA_OFFLOAD_HEADER is
+    set, and otherwise by Django with support for conditional and range
+    requests.
+    """
+    if settings.MEDIA_OFFLOAD_HEADER:
+        response = offload_response(name, path)
+    else:
+        etag = etag_for(path)
+        last_modified = int(os.path.getmtime(path))
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if response is None:
+            response = file_response(request, path)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = CACHE_CONTROL
+    patch_vary_headers(response, ('Authorization',))
+    return response
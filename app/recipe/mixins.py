@@ -0,0 +1,242 @@
+import hashlib
+from calendar import timegm
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlencode, http_date, quote_etag
+from rest_framework.response import Response
+
+from core.db.routers import read_from_replica
+
+from recipe.cache import response_cache, get_data_version
+from recipe.fragments import PrerenderedResponse, encode, encode_page, \
+    get_fragment, set_fragment
+
+
+def sorted_query_string(request):
+    """Return the request query string in a canonical order"""
+    return urlencode(sorted(request.query_params.lists()), doseq=True)
+
+
+def make_etag(*parts):
+    """Return a quoted entity tag built from parts"""
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode())
+    return quote_etag(digest.hexdigest())
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 response if the client's copy is current"""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified
+    )
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+class ConditionalListMixin:
+    """Answer list requests for unchanged data with 304 Not Modified
+
+    The entity tag is derived from the user's data version, so the
+    check runs no query and never serializes the list. Lists carry no
+    Last-Modified, as no timestamp moves when a row is deleted or
+    a relation is swapped for another. Lists read from a replica get
+    no entity tag, as they may be older than the data version.
+    """
+
+    def list(self, request, *args, **kwargs):
+        etag = make_etag(
+            self.basename,
+            request.user.pk,
+            get_data_version(request.user.pk),
+            request.accepted_renderer.format,
+            request.get_host(),
+            sorted_query_string(request),
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200 and not read_from_replica():
+            response['ETag'] = etag
+        return response
+
+
+class ConditionalRetrieveMixin:
+    """Answer detail requests for unchanged rows with 304 Not Modified
+
+    Only the row's updated_at is read to check the validators, the
+    object and its relations are loaded when the client is out of date.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            updated_at = self.get_queryset().prefetch_related(None).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            # a malformed lookup value, e.g. a pk that is not a number
+            updated_at = None
+        if updated_at is None:
+            # let the regular lookup raise the 404
+            return super().retrieve(request, *args, **kwargs)
+        # kept for FragmentRetrieveMixin
+        self.row_updated_at = updated_at
+
+        etag = make_etag(
+            self.basename,
+            self.kwargs[lookup_url_kwarg],
+            updated_at.isoformat(),
+            request.accepted_renderer.format,
+            # the image urls are absolute, so they depend on the host
+            request.get_host(),
+        )
+        last_modified = timegm(updated_at.utctimetuple())
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class CachedListMixin:
+    """Serve list responses from the response cache
+
+    Entries are keyed by the user's data version, which every write to
+    their recipes, tags or ingredients replaces. A stale entry can
+    therefore never be served and is simply left to be evicted. Lists
+    read from a replica are not stored, as a lagging replica could
+    return data older than the version they would be stored under.
+    """
+
+    def list(self, request, *args, **kwargs):
+        # read the version before the data, so a write that lands while
+        # the response is being built leaves it under an outdated key
+        key = self.get_list_cache_key(request)
+        data = response_cache.get(key)
+        if data is not None:
+            if isinstance(data, bytes):
+                response = PrerenderedResponse(data)
+            else:
+                response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if isinstance(response, PrerenderedResponse):
+            # keep the json rather than parsing it back
+            data = response.prerendered
+        else:
+            data = response.data
+        if response.status_code == 200 and not read_from_replica():
+            response_cache.set(key, data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def get_list_cache_key(self, request):
+        """Return the cache key for the list requested"""
+        return ':'.join((
+            'recipe-list',
+            self.basename,
+            str(request.user.pk),
+            get_data_version(request.user.pk),
+            # next links are absolute, so they depend on the host
+            request.get_host(),
+            sorted_query_string(request),
+        ))
+
+
+class RowListMixin:
+    """Build list pages from values() rows rather than model instances
+
+    The rows are rendered by a RowSerializer made from the view's
+    serializer class, which gives the same output for a fraction of
+    the work. Set row_serializer to None to list through the
+    serializer.
+    """
+    row_serializer = None
+    # columns read for the response besides the serialized ones
+    row_extra_fields = ()
+
+    def list(self, request, *args, **kwargs):
+        row_serializer = self.row_serializer
+        if row_serializer is None or self.paginator is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # the relations are read by the row serializer
+        queryset = queryset.prefetch_related(None)
+        # the rows must also carry the values the pages are ordered by
+        ordering = self.paginator.get_ordering(request, queryset, self)
+        names = list(row_serializer.columns)
+        extra = [field.lstrip('-') for field in ordering]
+        for name in extra + list(self.row_extra_fields):
+            if name not in names:
+                names.append(name)
+        page = self.paginate_queryset(queryset.values(*names))
+        return self.get_row_response(page)
+
+    def get_row_response(self, rows):
+        """Return the response listing a page of rows"""
+        return self.get_paginated_response(self.row_serializer.render(rows))
+
+
+class FragmentListMixin(RowListMixin):
+    """Join list pages from the cached json of each recipe
+
+    Only the recipes missing from the fragment cache, or changed since
+    they were cached, are rendered, and their relations read.
+    """
+    row_extra_fields = ('updated_at',)
+
+    def get_row_response(self, rows):
+        versions = [row['updated_at'].isoformat() for row in rows]
+        fragments = [
+            get_fragment('list', row['id'], version)
+            for row, version in zip(rows, versions)
+        ]
+        missing = [
+            row for row, fragment in zip(rows, fragments) if fragment is None
+        ]
+        rendered = iter(self.row_serializer.render(missing))
+        for i, (row, version) in enumerate(zip(rows, versions)):
+            if fragments[i] is None:
+                fragments[i] = encode(next(rendered))
+                set_fragment('list', row['id'], version, fragments[i])
+        return PrerenderedResponse(
+            encode_page(self.paginator.get_next_link(), fragments)
+        )
+
+
+class FragmentRetrieveMixin:
+    """Answer detail requests from the cached json of the object
+
+    ConditionalRetrieveMixin reads the row's updated_at, so a recipe
+    found in the cache is returned without loading it or its
+    relations.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        updated_at = getattr(self, 'row_updated_at', None)
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        pk = self.kwargs[lookup_url_kwarg]
+        # the image urls are absolute, so they depend on the host
+        version = (updated_at.isoformat(), request.build_absolute_uri('/'))
+        content = get_fragment('detail', pk, version)
+        if content is not None:
+            return PrerenderedResponse(content)
+
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_fragment('detail', pk, version, encode(response.data))
+        return response
@@ -0,0 +1,154 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginate by seeking past the last row of the previous page
+
+    The cursor handed to the client encodes the ordering values of the
+    last row it received, so every page is an indexed range scan.
+    No OFFSET and no COUNT(*) is run, which makes deep pages as cheap
+    as the first one.
+    """
+    # the ordering must end with a unique field so that the
+    # position of every row is unambiguous
+    ordering = ('-id',)
+    page_size = 100
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.page_size = self.get_page_size(request)
+
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+
+        # fetch one extra row to find out whether there is a next page
+        rows = list(queryset.order_by(*self.ordering)[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_ordering(self, request, queryset, view):
+        """Return the ordering the keyset is built on, which the view
+        can change per request through get_keyset_ordering"""
+        get_keyset_ordering = getattr(view, 'get_keyset_ordering', None)
+        if get_keyset_ordering is not None:
+            ordering = get_keyset_ordering()
+            if ordering:
+                return ordering
+        return self.ordering
+
+    def get_page_size(self, request):
+        """Return the requested page size, capped at max_page_size"""
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = [
+            self._get_value(self.page[-1], field.lstrip('-'))
+            for field in self.ordering
+        ]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(position)
+        )
+
+    def get_seek_filter(self, position):
+        """Return a filter matching the rows after position
+
+        For an ordering (a, b, c) this builds
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        flipping each comparison for descending fields.
+        """
+        seek = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            seek |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return seek
+
+    def encode_cursor(self, position):
+        """Return an opaque cursor for the given ordering values"""
+        data = json.dumps(position, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request, queryset):
+        """Return the ordering values encoded in the request cursor
+
+        Each value is converted by the field it was read from, so a
+        cursor that was tampered with is rejected here rather than
+        failing in the seek filter.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering) or \
+                not all(isinstance(v, (str, int, float)) for v in position):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                self._get_field(queryset, field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _get_field(self, queryset, name):
+        """Return the model field or annotation the rows are ordered by"""
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+    def _get_value(self, row, name):
+        """Read a field from a model instance or a values() row"""
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+
+class RecipePagination(KeysetPagination):
+    """Paginate recipes newest first"""
+    ordering = ('-id',)
+
+
+class NamePagination(KeysetPagination):
+    """Paginate tags and ingredients alphabetically"""
+    ordering = ('name', 'id')
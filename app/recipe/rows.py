@@ -0,0 +1,79 @@
+from collections import OrderedDict, defaultdict
+
+from rest_framework import serializers
+
+
+# fields whose representation of a database value is the value itself
+PLAIN_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+)
+
+
+class RowSerializer:
+    """Render values() rows the way a ModelSerializer renders instances
+
+    The serializer's fields are inspected once. Per row, plain columns
+    are copied, the other fields convert their value with the bound
+    field's to_representation, and many-to-many fields are filled from
+    the relation's through table with one query per relation for the
+    whole page. No model instance and no serializer is built per row.
+    """
+
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        fields = serializer_class().fields
+        # (output name, row key or relation, converter) of each field
+        self.fields = []
+        self.columns = []
+        self.relations = {}
+        for name, field in fields.items():
+            if isinstance(field, serializers.ManyRelatedField):
+                model_field = model._meta.get_field(field.source)
+                self.relations[name] = (
+                    model_field.remote_field.through,
+                    model_field.m2m_field_name() + '_id',
+                    model_field.m2m_reverse_field_name() + '_id',
+                )
+                self.fields.append((name, None, None))
+                continue
+            self.columns.append(field.source)
+            converter = None
+            if type(field) not in PLAIN_FIELDS:
+                converter = field.to_representation
+            self.fields.append((name, field.source, converter))
+
+    def related_ids(self, ids):
+        """Return the related ids of each relation, grouped by row id"""
+        grouped = {}
+        for name, (through, column, related) in self.relations.items():
+            grouped[name] = defaultdict(list)
+            # relations have no ordering of their own. Related ids come
+            # in ascending order, as read from the through table's
+            # unique index
+            pairs = through.objects.filter(
+                **{f'{column}__in': ids}
+            ).order_by(column, related).values_list(column, related)
+            for pk, related_pk in pairs:
+                grouped[name][pk].append(related_pk)
+        return grouped
+
+    def render(self, rows):
+        """Return the representation of each row"""
+        grouped = {}
+        if self.relations and rows:
+            grouped = self.related_ids([row['id'] for row in rows])
+        data = []
+        for row in rows:
+            item = OrderedDict()
+            for name, source, converter in self.fields:
+                if source is None:
+                    item[name] = grouped[name].get(row['id'], [])
+                    continue
+                value = row[source]
+                if converter is not None and value is not None:
+                    value = converter(value)
+                item[name] = value
+            data.append(item)
+        return data
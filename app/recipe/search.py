@@ -0,0 +1,67 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    SearchVector, TrigramSimilarity
+from django.db.models import CharField, IntegerField, Q, Value
+from django.db.models.functions import Cast
+from django.db.models.lookups import IContains
+
+# text search configuration of the recipe title index. The vector must
+# be built exactly like the index expression in migration 0007 for
+# postgres to use the index
+SEARCH_CONFIG = 'english'
+
+
+@CharField.register_lookup
+class TrigramIContains(IContains):
+    """Case-insensitive substring match the trigram indexes can serve
+
+    icontains compiles to UPPER(column) LIKE UPPER(pattern), and the
+    indexes are on the column itself. ILIKE on the column uses them.
+    """
+    lookup_name = 'trigram_icontains'
+
+    def as_sql(self, compiler, connection):
+        lhs_sql, params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        params.extend(rhs_params)
+        return f'{lhs_sql} ILIKE {rhs_sql}', params
+
+
+def _rank(score):
+    """Return a relevance score scaled to an integer
+
+    Ranks end up in pagination cursors, and integers survive the round
+    trip to the client and back exactly where floats may not.
+    """
+    return Cast(score * Value(1000000), IntegerField())
+
+
+def search_recipes(queryset, text):
+    """Return the recipes matching text, annotated with a relevance rank
+
+    Recipes match on stemmed title words (the full-text GIN index) or,
+    to tolerate typos and partial words, on trigram similarity and
+    substrings of the title (the trigram GIN index).
+    """
+    vector = SearchVector('title', config=SEARCH_CONFIG)
+    query = SearchQuery(text, config=SEARCH_CONFIG)
+    return queryset.annotate(
+        title_vector=vector,
+        rank=_rank(
+            SearchRank(vector, query) + TrigramSimilarity('title', text)
+        )
+    ).filter(
+        Q(title_vector=query) |
+        Q(title__trigram_similar=text) |
+        Q(title__trigram_icontains=text)
+    )
+
+
+def search_names(queryset, text):
+    """Return the tags/ingredients whose name resembles text, annotated
+    with a relevance rank"""
+    return queryset.annotate(
+        rank=_rank(TrigramSimilarity('name', text))
+    ).filter(
+        Q(name__trigram_similar=text) |
+        Q(name__trigram_icontains=text)
+    )
@@ -1,6 +1,63 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from core.models import Tag, Ingredient, Recipe
+from recipe.images import rendition_urls
+
+
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """Resolve a list of primary keys with a single query"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pk_field = child.get_queryset().model._meta.pk
+        pks = []
+        for item in data:
+            # to_python would accept True as 1
+            if isinstance(item, bool):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                pks.append(pk_field.to_python(item))
+            except DjangoValidationError:
+                child.fail('incorrect_type', data_type=type(item).__name__)
+
+        found = child.get_queryset().in_bulk(pks)
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in found]
+        if missing:
+            # every unknown id is reported, not only the first one
+            raise serializers.ValidationError([
+                child.error_messages['does_not_exist'].format(pk_value=pk)
+                for pk in missing
+            ])
+        # the instances themselves are saved, so they are not fetched
+        # again when the relation is set
+        return [found[pk] for pk in dict.fromkeys(pks)]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field limited to the objects of the requesting user"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        """Validate many primary keys together with one query"""
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(user=request.user)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -8,26 +65,42 @@ class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = ('id', 'name')
-        read_only_fields = ('id',)
+        fields = ('id', 'name', 'recipe_count')
+        read_only_fields = ('id', 'recipe_count')
 
 
 class IngredientSerializer(serializers.ModelSerializer):
     """Serializer for ingredient objects"""
     class Meta:
         model = Ingredient
+        fields = ('id', 'name', 'recipe_count')
+        read_only_fields = ('id', 'recipe_count')
+
+
+class RecipeTagSerializer(TagSerializer):
+    """Serialize a tag nested in a recipe"""
+
+    class Meta(TagSerializer.Meta):
+        # the count changes with other recipes, which would leave the
+        # representation of this one out of date with its updated_at
+        fields = ('id', 'name')
+
+
+class RecipeIngredientSerializer(IngredientSerializer):
+    """Serialize an ingredient nested in a recipe"""
+
+    class Meta(IngredientSerializer.Meta):
         fields = ('id', 'name')
-        read_only_fields = ('id',)
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     """Serialize a recipe"""
     # lists all the ingredient id's associated with this recipe
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
@@ -39,16 +112,52 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class RecipeBulkSerializer(RecipeSerializer):
+    """Serialize a recipe of a bulk write"""
+    # recipe to replace, a new recipe is created when left out
+    id = serializers.IntegerField(required=False)
+    # related ids are checked for the whole batch at once by the view,
+    # rather than with one query per id
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+
+    class Meta(RecipeSerializer.Meta):
+        read_only_fields = ()
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serialize a recipe detail"""
     # nest serializer in another serializer to display more info
-    ingredients = IngredientSerializer(many=True, read_only=True)
-    tags = TagSerializer(many=True, read_only=True)
+    ingredients = RecipeIngredientSerializer(many=True, read_only=True)
+    tags = RecipeTagSerializer(many=True, read_only=True)
+    renditions = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'image', 'image_status', 'renditions'
+        )
+        read_only_fields = ('id', 'image', 'image_status')
+
+    def get_renditions(self, recipe):
+        """Return the urls of the recipe's resized images"""
+        return rendition_urls(recipe, self.context.get('request'))
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
+    renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status', 'renditions')
+        read_only_fields = ('id', 'image_status')
+
+    def get_renditions(self, recipe):
+        """Return the urls of the recipe's resized images"""
+        return rendition_urls(recipe, self.context.get('request'))
@@ -0,0 +1,133 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, \
+                                     m2m_changed
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.cache import invalidate_user_cache
+from recipe.counts import refresh_recipe_counts
+from recipe.fragments import delete_fragments
+from recipe.images import release_image
+
+
+def invalidate_owner_cache(sender, instance, **kwargs):
+    """Bump the data version of the user owning instance"""
+    invalidate_user_cache(instance.user_id)
+
+
+def invalidate_on_m2m_change(sender, instance, action, **kwargs):
+    """Bump the owner's data version after recipe relations change"""
+    if action.startswith('post_'):
+        invalidate_owner_cache(sender, instance)
+
+
+# name of the recipe relation each tag or ingredient is reached through
+RECIPE_RELATIONS = {Tag: 'tags', Ingredient: 'ingredients'}
+
+
+def touch_recipes(**filters):
+    """Refresh updated_at of the recipes matching filters"""
+    now = timezone.now()
+    Recipe.objects.filter(**filters).update(updated_at=now)
+    return now
+
+
+def touch_recipes_on_m2m_change(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    """Mark recipes as updated when their tags or ingredients change"""
+    if not reverse:
+        if action.startswith('post_'):
+            instance.updated_at = touch_recipes(pk=instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        touch_recipes(pk__in=pk_set)
+    elif action == 'pre_clear':
+        # the recipes losing the tag/ingredient are only known up front
+        touch_recipes(**{RECIPE_RELATIONS[type(instance)]: instance})
+
+
+def touch_recipes_using(sender, instance, created=False, **kwargs):
+    """Mark recipes as updated when one of their tags or ingredients
+    is renamed or deleted"""
+    if not created:
+        touch_recipes(**{RECIPE_RELATIONS[type(instance)]: instance})
+
+
+def count_recipes_on_m2m_change(sender, instance, action, reverse, model,
+                                pk_set, **kwargs):
+    """Recount the recipes of the tags/ingredients whose recipes
+    changed"""
+    if reverse:
+        # recipes were added to or removed from a single tag/ingredient
+        if action.startswith('post_'):
+            refresh_recipe_counts(type(instance), [instance.pk])
+    elif action == 'pre_clear':
+        # the tags/ingredients losing the recipe are only known up front
+        field = RECIPE_RELATIONS[model]
+        instance._cleared_ids = list(
+            getattr(instance, field).values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        refresh_recipe_counts(model, instance.__dict__.pop('_cleared_ids'))
+    elif action in ('post_add', 'post_remove'):
+        refresh_recipe_counts(model, pk_set)
+
+
+def collect_recipe_relations(sender, instance, **kwargs):
+    """Remember the tags/ingredients of a recipe about to be deleted"""
+    instance._related_ids = {
+        model: list(getattr(instance, field).values_list('id', flat=True))
+        for model, field in RECIPE_RELATIONS.items()
+    }
+
+
+def count_recipes_on_delete(sender, instance, **kwargs):
+    """Recount the recipes of a deleted recipe's tags/ingredients"""
+    for model, ids in instance.__dict__.pop('_related_ids', {}).items():
+        refresh_recipe_counts(model, ids)
+
+
+def drop_recipe_fragments(sender, instance, **kwargs):
+    """Free the cached json of a saved or deleted recipe"""
+    delete_fragments([instance.pk])
+
+
+def drop_fragments_on_m2m_change(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    """Free the cached json of recipes whose relations changed
+
+    Fragments are stored with the recipe's updated_at, which every
+    relation change moves, so the recipes that would need a query to
+    find are left for the cache to evict.
+    """
+    if not reverse:
+        if action.startswith('post_'):
+            delete_fragments([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        delete_fragments(pk_set)
+
+
+def release_recipe_image(sender, instance, **kwargs):
+    """Delete the image of a deleted recipe unless others share it"""
+    image = instance.image
+    transaction.on_commit(lambda: release_image(image))
+
+
+for model in (Tag, Ingredient, Recipe):
+    post_save.connect(invalidate_owner_cache, sender=model)
+    post_delete.connect(invalidate_owner_cache, sender=model)
+
+post_delete.connect(release_recipe_image, sender=Recipe)
+post_save.connect(drop_recipe_fragments, sender=Recipe)
+post_delete.connect(drop_recipe_fragments, sender=Recipe)
+pre_delete.connect(collect_recipe_relations, sender=Recipe)
+post_delete.connect(count_recipes_on_delete, sender=Recipe)
+
+for through in (Recipe.tags.through, Recipe.ingredients.through):
+    m2m_changed.connect(invalidate_on_m2m_change, sender=through)
+    m2m_changed.connect(touch_recipes_on_m2m_change, sender=through)
+    m2m_changed.connect(count_recipes_on_m2m_change, sender=through)
+    m2m_changed.connect(drop_fragments_on_m2m_change, sender=through)
+
+for model in (Tag, Ingredient):
+    post_save.connect(touch_recipes_using, sender=model)
+    pre_delete.connect(touch_recipes_using, sender=model)
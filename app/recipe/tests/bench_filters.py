@@ -0,0 +1,77 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Recipe, Tag
+from recipe.views import RecipeViewSet
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+RECIPES = 500
+TAGS_PER_RECIPE = 25
+RUNS = 20
+
+
+class TagFilterBenchmark(TestCase):
+    """Compare joined and semi-join tag filters on heavily tagged
+    recipes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        cls.tags = Tag.objects.bulk_create(
+            Tag(user=cls.user, name=f'Tag {i}')
+            for i in range(TAGS_PER_RECIPE)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(user=cls.user, title=f'Recipe {i}', time_minutes=10,
+                   price=5)
+            for i in range(RECIPES)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes for tag in cls.tags
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_recipe, core_recipe_tags')
+
+    def recipe_queryset(self, params):
+        """Return the queryset RecipeViewSet lists for params"""
+        view = RecipeViewSet(action='list')
+        view.request = Request(APIRequestFactory().get(RECIPE_URL, params))
+        view.request.user = self.user
+        return view.get_queryset().prefetch_related(None)
+
+    def time_query(self, queryset):
+        """Return the mean seconds and row count of a queryset"""
+        rows = len(queryset)
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            len(queryset.all())
+        return (time.perf_counter() - start) / RUNS, rows
+
+    def test_tag_filters(self):
+        tag_ids = [tag.id for tag in self.tags]
+        joined = Recipe.objects.filter(
+            user=self.user,
+            tags__id__in=tag_ids
+        )
+        results = [('join (previous)',) + self.time_query(joined)]
+        for match in ('any', 'all'):
+            queryset = self.recipe_queryset({
+                'tags': ','.join(str(pk) for pk in tag_ids),
+                'match': match,
+            })
+            results.append((f'match={match}',) + self.time_query(queryset))
+
+        print(f'\nfilter {RECIPES} recipes by {TAGS_PER_RECIPE} tags:')
+        for name, seconds, rows in results:
+            print(f'  {name:16} {rows:6} rows {seconds * 1e3:8.2f}ms')
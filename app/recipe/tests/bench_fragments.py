@@ -0,0 +1,86 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import response_cache
+from recipe.fragments import fragment_cache
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+# a full page, as listed with ?page_size=500
+ROWS = 500
+RELATED_PER_RECIPE = 3
+RUNS = 10
+
+
+class FragmentListBenchmark(TestCase):
+    """Measure the CPU time of a recipe list call with and without
+    cached fragments"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(user=cls.user, name=f'Tag {i}') for i in range(ROWS)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=cls.user, name=f'Ingredient {i}')
+            for i in range(ROWS)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(user=cls.user, title=f'Recipe {i}', time_minutes=10,
+                   price=5, link='https://example.com')
+            for i in range(ROWS)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for i, recipe in enumerate(recipes)
+            for tag in tags[i:i + RELATED_PER_RECIPE]
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient.id
+            )
+            for i, recipe in enumerate(recipes)
+            for ingredient in ingredients[i:i + RELATED_PER_RECIPE]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def time_list(self, warm):
+        """Return the mean CPU and wall seconds of a list call"""
+        cpu = wall = 0
+        for _ in range(RUNS):
+            # the whole list is never cached, as after any write
+            response_cache.clear()
+            if not warm:
+                fragment_cache.clear()
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            self.client.get(RECIPE_URL, {'page_size': ROWS}).content
+            cpu += time.process_time() - cpu_start
+            wall += time.perf_counter() - wall_start
+        return cpu / RUNS, wall / RUNS
+
+    def test_list_cpu_time(self):
+        self.client.get(RECIPE_URL, {'page_size': ROWS})
+        cold_cpu, cold_wall = self.time_list(warm=False)
+        warm_cpu, warm_wall = self.time_list(warm=True)
+        print(f'\nlist {ROWS} recipes:')
+        print(f'  no fragments   cpu {cold_cpu * 1e3:7.2f}ms  '
+              f'wall {cold_wall * 1e3:7.2f}ms')
+        print(f'  fragments      cpu {warm_cpu * 1e3:7.2f}ms  '
+              f'wall {warm_wall * 1e3:7.2f}ms')
+        print(f'  saved per call cpu {(cold_cpu - warm_cpu) * 1e3:7.2f}ms')
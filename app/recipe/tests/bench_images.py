@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from PIL import Image
+
+from recipe import imaging
+
+
+IMAGES = 24
+# a typical phone photo
+IMAGE_SIZE = (4000, 3000)
+
+
+class ImageRenderingBenchmark(SimpleTestCase):
+    """Measure how many uploads the image workers render per second"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = os.path.join(self.directory, 'source.jpg')
+        Image.effect_noise(IMAGE_SIZE, 64).convert('RGB').save(
+            self.source,
+            'JPEG',
+            quality=90
+        )
+
+    def renditions(self, number):
+        """Return the rendition targets of the number-th image"""
+        return [
+            (os.path.join(self.directory, f'{number}.{name}.jpg'), options)
+            for name, options in settings.RECIPE_IMAGE_RENDITIONS.items()
+        ]
+
+    def time_rendering(self, workers):
+        """Return the images rendered per second by workers processes"""
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context) as executor:
+            # start the workers before the clock does
+            list(executor.map(imaging.render, [self.source] * workers,
+                              [self.renditions(-1)] * workers))
+            start = time.perf_counter()
+            list(executor.map(
+                imaging.render,
+                [self.source] * IMAGES,
+                [self.renditions(number) for number in range(IMAGES)]
+            ))
+            return IMAGES / (time.perf_counter() - start)
+
+    def test_rendering_throughput(self):
+        print(f'\nrender {len(settings.RECIPE_IMAGE_RENDITIONS)} '
+              f'renditions of {IMAGES} {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]} '
+              'images:')
+        for workers in sorted({1, os.cpu_count()}):
+            rate = self.time_rendering(workers)
+            print(f'  {workers:2} workers {rate:7.2f} images/s '
+                  f'{rate / workers:7.2f} images/s per core')
@@ -0,0 +1,98 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Prefetch
+from django.test import TestCase
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.rows import RowSerializer
+from recipe.serializers import RecipeSerializer, TagSerializer
+
+
+# rows of a full page, as listed with ?page_size=500
+ROWS = 500
+NAMES = 50
+RELATED_PER_RECIPE = 3
+RUNS = 10
+
+
+class RowSerializerBenchmark(TestCase):
+    """Compare the rows per second the serializers and the row
+    serializers render"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(user=cls.user, name=f'Tag {i}') for i in range(ROWS)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=cls.user, name=f'Ingredient {i}')
+            for i in range(NAMES)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(user=cls.user, title=f'Recipe {i}', time_minutes=10,
+                   price=5, link='https://example.com')
+            for i in range(ROWS)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for i, recipe in enumerate(recipes)
+            for tag in tags[i:i + RELATED_PER_RECIPE]
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient.id
+            )
+            for i, recipe in enumerate(recipes)
+            for ingredient in ingredients[i % NAMES:][:RELATED_PER_RECIPE]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def rate(self, render):
+        """Return the rows per second render() turns into data"""
+        render()
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            rows = len(render())
+        return rows * RUNS / (time.perf_counter() - start)
+
+    def compare(self, name, serializer_class, queryset, prefetches=()):
+        """Print the rates of the serializer and the row serializer"""
+        row_serializer = RowSerializer(serializer_class)
+        serializer_rate = self.rate(lambda: serializer_class(
+            queryset.prefetch_related(*prefetches),
+            many=True
+        ).data)
+        row_rate = self.rate(lambda: row_serializer.render(
+            list(queryset.values(*row_serializer.columns))
+        ))
+        print(f'  {name:8} serializer {serializer_rate:9.0f} rows/s  '
+              f'rows {row_rate:9.0f} rows/s  '
+              f'({row_rate / serializer_rate:.1f}x)')
+
+    def test_list_rendering(self):
+        print(f'\nrender {ROWS} rows, queries included:')
+        self.compare(
+            'recipes',
+            RecipeSerializer,
+            Recipe.objects.filter(user=self.user).order_by('-id'),
+            (
+                Prefetch('tags', queryset=Tag.objects.only('id')),
+                Prefetch(
+                    'ingredients',
+                    queryset=Ingredient.objects.only('id')
+                ),
+            )
+        )
+        self.compare(
+            'tags',
+            TagSerializer,
+            Tag.objects.filter(user=self.user).order_by('name', 'id')
+        )
@@ -0,0 +1,171 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import get_data_version
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+# queries a bulk write runs however many recipes it holds: the id
+# checks, the inserts, the locks and recounts of the tags and
+# ingredients and the reload of the written recipes, plus the savepoint
+# the transaction opens inside the test case
+BULK_CREATE_BUDGET = 14
+
+
+def sample_recipe(user, **params):
+    """Create and return sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class BulkRecipeApiTests(TestCase):
+    """Test writing many recipes in one request"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user,
+            name='Salt'
+        )
+
+    def payload(self, count):
+        """Return count recipes using the sample tag and ingredient"""
+        return [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': [self.tag.id],
+                'ingredients': [self.ingredient.id],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create(self):
+        """Test creating recipes with their tags and ingredients"""
+        payload = self.payload(2)
+        payload[1]['tags'] = []
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item['title'] for item in res.data],
+            ['Recipe 0', 'Recipe 1']
+        )
+        recipe = Recipe.objects.get(id=res.data[0]['id'])
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
+        self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+        self.assertEqual(res.data[1]['tags'], [])
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.recipe_count, 1)
+
+    def test_bulk_create_fixed_queries(self):
+        """Test the number of queries does not grow with the batch"""
+        for count in (1, 50):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(
+                    BULK_URL,
+                    self.payload(count),
+                    format='json'
+                )
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertLessEqual(
+                len(ctx.captured_queries),
+                BULK_CREATE_BUDGET,
+                '\n'.join(query['sql'] for query in ctx.captured_queries)
+            )
+
+    def test_bulk_replace(self):
+        """Test items with an id replace the existing recipe"""
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.tag)
+        payload = self.payload(1)
+        payload[0].update(id=recipe.id, title='Curry', tags=[])
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Curry')
+        self.assertEqual(recipe.price, Decimal('5.00'))
+        self.assertEqual(recipe.tags.count(), 0)
+        self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+        # the replaced relations are taken off the counts
+        self.tag.refresh_from_db()
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.tag.recipe_count, 0)
+        self.assertEqual(self.ingredient.recipe_count, 1)
+
+    def test_bulk_errors_per_item(self):
+        """Test errors are reported by position and nothing is written"""
+        user2 = get_user_model().objects.create_user(
+            'other@google.com',
+            'testpass'
+        )
+        other_tag = Tag.objects.create(user=user2, name='Other')
+        payload = self.payload(3)
+        payload[1]['tags'] = [other_tag.id]
+        del payload[2]['title']
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('title', res.data[2])
+        self.assertFalse(Recipe.objects.exists())
+
+        del payload[2]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(res.data[1]), ['tags'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_replace_other_users_recipe(self):
+        """Test recipes of other users cannot be replaced"""
+        user2 = get_user_model().objects.create_user(
+            'other@google.com',
+            'testpass'
+        )
+        recipe = sample_recipe(user2)
+        payload = self.payload(1)
+        payload[0]['id'] = recipe.id
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Sample recipe')
+
+    def test_bulk_requires_list(self):
+        """Test the request body must be a non empty list"""
+        for payload in ({'title': 'Curry'}, []):
+            res = self.client.post(BULK_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_invalidates_cache(self):
+        """Test a bulk write bumps the user's data version"""
+        version = get_data_version(self.user.pk)
+        self.client.post(BULK_URL, self.payload(1), format='json')
+        self.assertNotEqual(get_data_version(self.user.pk), version)
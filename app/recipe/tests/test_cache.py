@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.cache import get_data_version
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_recipe(user, **params):
+    """Create and return sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ListCacheTests(TestCase):
+    """Test caching of the recipe API list responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_repeat_list_served_from_cache(self):
+        """Test an unchanged list is served without touching the db"""
+        sample_recipe(self.user)
+        first = self.client.get(RECIPE_URL)
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(RECIPE_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+
+    def test_query_params_cached_separately(self):
+        """Test different query strings get different entries"""
+        self.client.get(TAGS_URL)
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_cache_per_user(self):
+        """Test users never see each other's cached lists"""
+        sample_recipe(self.user, title='Mine')
+        self.client.get(RECIPE_URL)
+        user2 = get_user_model().objects.create_user(
+            'other@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    def test_write_invalidates_list(self):
+        """Test creating, changing and deleting rows bump the version"""
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        writes = (
+            lambda: sample_recipe(self.user, title='Another'),
+            lambda: recipe.tags.add(tag),
+            lambda: Tag.objects.create(user=self.user, name='Dessert'),
+            lambda: recipe.delete(),
+        )
+        for write in writes:
+            self.client.get(RECIPE_URL)
+            version = get_data_version(self.user.pk)
+            write()
+            self.assertNotEqual(get_data_version(self.user.pk), version)
+            res = self.client.get(RECIPE_URL)
+            self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_list_reflects_m2m_change(self):
+        """Test a cached list is refreshed after tags are assigned"""
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPE_URL)
+
+        recipe.tags.add(tag)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data['results'][0]['tags'], [tag.id])
@@ -0,0 +1,150 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_recipe(user, **params):
+    """Create and return sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """Test conditional GET support of the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_updated_at_tracked(self):
+        """Test updated_at is set on save and on relation changes"""
+        recipe = sample_recipe(self.user)
+        created = recipe.updated_at
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.assertIsNotNone(tag.updated_at)
+
+        recipe.tags.add(tag)
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, created)
+
+    def test_unchanged_list_not_modified(self):
+        """Test a list fetched with a current ETag returns 304"""
+        sample_recipe(self.user)
+        for url in (RECIPE_URL, TAGS_URL):
+            res = self.client.get(url)
+            self.assertIn('ETag', res)
+
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_changed_list_modified(self):
+        """Test a write makes the previous list ETag stale"""
+        recipe = sample_recipe(self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        recipe.delete()
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.data['results'], [])
+
+    def test_list_etag_depends_on_query(self):
+        """Test the list ETag differs between filters"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+        res = self.client.get(
+            RECIPE_URL,
+            {'page_size': 1},
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_unchanged_detail_not_modified(self):
+        """Test detail validators are checked without serializing"""
+        recipe = sample_recipe(self.user)
+        res = self.client.get(detail_url(recipe.id))
+        self.assertIn('Last-Modified', res)
+
+        with CaptureQueriesContext(connection) as ctx:
+            by_etag = self.client.get(
+                detail_url(recipe.id),
+                HTTP_IF_NONE_MATCH=res['ETag']
+            )
+        self.assertEqual(len(ctx.captured_queries), 1)
+        by_date = self.client.get(
+            detail_url(recipe.id),
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+
+        self.assertEqual(by_etag.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(by_date.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'api.example.com'])
+    def test_detail_etag_depends_on_host(self):
+        """Test a detail fetched under another host is not a 304"""
+        recipe = sample_recipe(self.user)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+
+        res = self.client.get(
+            detail_url(recipe.id),
+            HTTP_IF_NONE_MATCH=etag,
+            HTTP_HOST='api.example.com'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_modified_by_related_rename(self):
+        """Test renaming a tag invalidates the recipe detail ETag"""
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
+
+    def test_detail_of_other_user_not_found(self):
+        """Test conditional detail requests still check ownership"""
+        user2 = get_user_model().objects.create_user(
+            'other@google.com',
+            'testpass'
+        )
+        recipe = sample_recipe(user2)
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_with_malformed_id_not_found(self):
+        """Test a recipe id that is not a number is not found"""
+        res = self.client.get(detail_url('abc'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.test import TransactionTestCase
+
+from core.models import Recipe, Tag
+
+
+def sample_recipe(user, title):
+    """Create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=10,
+        price=5.00
+    )
+
+
+class ConcurrentRecipeCountTests(TransactionTestCase):
+    """Test recipe counts stay exact when recipes change concurrently"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.tag = Tag.objects.create(user=user, name='Vegan')
+        self.recipes = [
+            sample_recipe(user, 'Curry'),
+            sample_recipe(user, 'Salad'),
+        ]
+
+    def lock_waiters(self):
+        """Return the number of other sessions waiting for a lock"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM pg_stat_activity "
+                "WHERE wait_event_type = 'Lock' AND pid <> pg_backend_pid()"
+            )
+            return cursor.fetchone()[0]
+
+    def test_concurrent_adds(self):
+        """Test adding a tag to two recipes at once counts both"""
+        added = threading.Event()
+        commit = threading.Event()
+        errors = []
+
+        def add_tag(recipe, hold):
+            try:
+                with transaction.atomic():
+                    recipe.tags.add(self.tag)
+                    if hold:
+                        added.set()
+                        commit.wait(10)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        first = threading.Thread(target=add_tag, args=(self.recipes[0], True))
+        first.start()
+        self.assertTrue(added.wait(10))
+        second = threading.Thread(
+            target=add_tag,
+            args=(self.recipes[1], False)
+        )
+        second.start()
+        # let the second transaction queue up behind the first one
+        deadline = time.monotonic() + 10
+        while not self.lock_waiters() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        commit.set()
+        first.join(10)
+        second.join(10)
+
+        self.assertEqual(errors, [])
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.recipe_count, 2)
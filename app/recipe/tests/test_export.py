@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.views import RecipeViewSet
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def sample_recipe(user, **params):
+    """Create and return sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def read_stream(response):
+    """Return the content of a streaming response as text"""
+    return b''.join(response.streaming_content).decode()
+
+
+class RecipeExportTests(TestCase):
+    """Test streaming exports of the recipe library"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def seed(self, count):
+        """Create count recipes, each with a tag and an ingredient"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipes = []
+        for i in range(count):
+            recipe = sample_recipe(self.user, title=f'Recipe {i}')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+            recipes.append(recipe)
+        return recipes
+
+    def test_export_ndjson(self):
+        """Test every recipe is exported across chunk boundaries"""
+        recipes = self.seed(5)
+        recipes[2].tags.clear()
+        with patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in read_stream(res).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [r.id for r in recipes])
+        self.assertEqual(rows[0]['tags'], ['Vegan'])
+        self.assertEqual(rows[0]['ingredients'], ['Salt'])
+        self.assertEqual(rows[0]['price'], '5.00')
+        self.assertEqual(rows[2]['tags'], [])
+
+    def test_export_csv(self):
+        """Test recipes are exported as csv with a header"""
+        self.seed(2)
+        res = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(read_stream(res))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1]['title'], 'Recipe 1')
+        self.assertEqual(rows[1]['tags'], 'Vegan')
+
+    def test_csv_round_trip(self):
+        """Test names holding the list separator survive an import of
+        the csv export"""
+        names = ['Salt|Pepper', 'C:\\', 'Oil']
+        recipe = sample_recipe(self.user, title='Dressing')
+        for name in names:
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=name)
+            )
+        res = self.client.get(EXPORT_URL, {'type': 'csv'})
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as stream:
+            stream.write(read_stream(res))
+        self.addCleanup(os.remove, path)
+        user2 = get_user_model().objects.create_user(
+            'other@google.com',
+            'testpass'
+        )
+
+        call_command(
+            'import_recipes',
+            path,
+            user=user2.email,
+            stdout=io.StringIO(),
+            stderr=io.StringIO()
+        )
+
+        imported = Recipe.objects.get(user=user2)
+        self.assertEqual(
+            sorted(imported.ingredients.values_list('name', flat=True)),
+            sorted(names)
+        )
+
+    def test_export_limited_to_user(self):
+        """Test only the user's own recipes are exported"""
+        user2 = get_user_model().objects.create_user(
+            'other@google.com',
+            'testpass'
+        )
+        sample_recipe(user2)
+        res = self.client.get(EXPORT_URL)
+        self.assertEqual(read_stream(res), '')
+
+    def test_export_unknown_type(self):
+        """Test an unsupported export type is rejected"""
+        res = self.client.get(EXPORT_URL, {'type': 'xml'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.cache import response_cache
+from recipe.fragments import fragment_cache, get_fragment
+from recipe.serializers import RecipeSerializer
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_recipe(user, title):
+    """Create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=10,
+        price=5.00
+    )
+
+
+class FragmentCacheTests(TestCase):
+    """Test recipes are served from their cached json"""
+
+    def setUp(self):
+        fragment_cache.clear()
+        response_cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            sample_recipe(self.user, f'Recipe {i}') for i in range(3)
+        ]
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipes[0].tags.add(self.tag)
+
+    def expected_list(self):
+        """Return the json the serializer gives for the recipe list"""
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        return JSONRenderer().render({
+            'next': None,
+            'results': RecipeSerializer(recipes, many=True).data,
+        })
+
+    def test_list_joined_from_fragments(self):
+        """Test lists are assembled from fragments of unchanged recipes"""
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.content, self.expected_list())
+
+        recipe = self.recipes[1]
+        recipe.title = 'Curry'
+        recipe.save()
+        hits = fragment_cache.stats()['hits']
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.content, self.expected_list())
+        # only the changed recipe was rendered again
+        self.assertEqual(fragment_cache.stats()['hits'] - hits, 2)
+
+    def test_list_data(self):
+        """Test the data of a joined list is available to other
+        renderers"""
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 3)
+
+        res = self.client.get(RECIPE_URL, {'format': 'api'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(b'Recipe 2', res.content)
+
+    def test_detail_served_from_fragment(self):
+        """Test a cached recipe is returned without loading it"""
+        url = detail_url(self.recipes[0].id)
+        res = self.client.get(url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(url)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.content, res.content)
+        self.assertEqual(cached['ETag'], res['ETag'])
+        # only the version of the row is read
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_fragments_dropped_on_change(self):
+        """Test changing a recipe's relations drops its fragments"""
+        recipe = self.recipes[0]
+        self.client.get(RECIPE_URL)
+        version = Recipe.objects.get(id=recipe.id).updated_at.isoformat()
+        self.assertIsNotNone(get_fragment('list', recipe.id, version))
+
+        recipe.tags.remove(self.tag)
+
+        self.assertIsNone(get_fragment('list', recipe.id, version))
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][-1]['tags'], [])
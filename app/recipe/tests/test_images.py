@@ -0,0 +1,320 @@
+import importlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.images import rendition_names, render_recipe_image, \
+    release_image
+
+
+RENDITIONS = {
+    'thumbnail': {'size': (20, 20), 'crop': True},
+    'full': {'size': (100, 100)},
+}
+
+# minimal EXIF block holding orientation 6, a photo taken with the
+# camera turned clockwise
+ROTATED_EXIF = (
+    b'Exif\x00\x00II*\x00\x08\x00\x00\x00\x01\x00'
+    b'\x12\x01\x03\x00\x01\x00\x00\x00\x06\x00\x00\x00\x00\x00\x00\x00'
+)
+
+
+def image_upload_url(recipe_id):
+    """Return URL for recipe image upload"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_image(size=(200, 100), **options):
+    """Return the content of a JPEG image"""
+    content = tempfile.SpooledTemporaryFile()
+    Image.new('RGB', size).save(content, format='JPEG', **options)
+    content.seek(0)
+    return content.read()
+
+
+class RecipeImageTests(TestCase):
+    """Test rendering the renditions of recipe images"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(
+            MEDIA_ROOT=media_root,
+            RECIPE_IMAGE_RENDITIONS=RENDITIONS,
+            RECIPE_IMAGE_WORKERS=0
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=5.00
+        )
+
+    def upload(self, recipe, content):
+        """Upload content as the image of recipe"""
+        return self.client.post(
+            image_upload_url(recipe.id),
+            {'image': ContentFile(content, name='image.jpg')},
+            format='multipart'
+        )
+
+    def set_image(self, content, name='image.jpg'):
+        """Save content as the recipe image, pending renditions"""
+        self.recipe.image.save(name, ContentFile(content), save=False)
+        self.recipe.image_status = Recipe.IMAGE_PENDING
+        self.recipe.save()
+
+    def test_upload_leaves_image_pending(self):
+        """Test the upload returns before the renditions are rendered"""
+        res = self.upload(self.recipe, sample_image())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        self.assertEqual(res.data['renditions'], {})
+
+    def test_render_renditions(self):
+        """Test each rendition is resized, upright and without EXIF"""
+        self.set_image(sample_image(exif=ROTATED_EXIF))
+        render_recipe_image(self.recipe)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        names = rendition_names(self.recipe.image.name)
+        storage = self.recipe.image.storage
+        with Image.open(storage.path(names['thumbnail'])) as thumbnail:
+            self.assertEqual(thumbnail.size, (20, 20))
+        with Image.open(storage.path(names['full'])) as full:
+            # the 200x100 image was stored on its side
+            self.assertEqual(full.size, (50, 100))
+            self.assertNotIn('exif', full.info)
+
+    def test_renditions_in_detail(self):
+        """Test rendition urls are listed once rendered"""
+        self.set_image(sample_image())
+        render_recipe_image(self.recipe)
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        self.assertEqual(set(res.data['renditions']), set(RENDITIONS))
+        self.assertTrue(
+            res.data['renditions']['thumbnail'].endswith('.thumbnail.jpg')
+        )
+
+    def test_render_invalid_image(self):
+        """Test an image that cannot be decoded is marked failed"""
+        self.set_image(b'not an image')
+        with self.assertLogs('recipe.images', 'ERROR'):
+            render_recipe_image(self.recipe)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+    def test_replaced_image_status_kept(self):
+        """Test rendering a replaced image leaves the new one pending"""
+        self.set_image(sample_image())
+        previous = Recipe.objects.get(pk=self.recipe.pk)
+        self.set_image(sample_image(size=(10, 10)))
+
+        render_recipe_image(previous)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PENDING)
+
+    def test_process_images_command(self):
+        """Test the command renders the images left pending"""
+        self.set_image(sample_image())
+        call_command('process_images', stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        names = rendition_names(self.recipe.image.name)
+        self.assertTrue(os.path.exists(
+            self.recipe.image.storage.path(names['full'])
+        ))
+
+    def test_existing_images_processed(self):
+        """Test images uploaded before image_status are queued and rendered"""
+        self.set_image(sample_image())
+        Recipe.objects.filter(pk=self.recipe.pk).update(image_status='')
+        migration = importlib.import_module(
+            'core.migrations.0013_pending_existing_images'
+        )
+
+        migration.mark_images_pending(apps, connection.schema_editor())
+        call_command('process_images', stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+
+    def test_identical_uploads_share_file(self):
+        """Test the same image uploaded twice is stored and rendered once"""
+        other = Recipe.objects.create(
+            user=self.user,
+            title='Other recipe',
+            time_minutes=10,
+            price=5.00
+        )
+        content = sample_image()
+        self.upload(self.recipe, content)
+        self.recipe.refresh_from_db()
+        render_recipe_image(self.recipe)
+
+        res = self.upload(other, content)
+
+        other.refresh_from_db()
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        directory = os.path.dirname(self.recipe.image.path)
+        originals = [
+            name for name in os.listdir(directory) if name.count('.') == 1
+        ]
+        self.assertEqual(len(originals), 1)
+
+    def test_release_shared_image(self):
+        """Test an image is deleted once the last recipe drops it"""
+        self.set_image(sample_image())
+        render_recipe_image(self.recipe)
+        other = Recipe.objects.create(
+            user=self.user,
+            title='Other recipe',
+            time_minutes=10,
+            price=5.00,
+            image=self.recipe.image.name
+        )
+        image = self.recipe.image
+        paths = [
+            image.storage.path(name)
+            for name in (image.name, *rendition_names(image.name).values())
+        ]
+
+        self.recipe.delete()
+        release_image(image)
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+
+        other.delete()
+        release_image(image)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+
+class ConcurrentImageReleaseTests(TransactionTestCase):
+    """Test releasing an image does not race with uploads of it"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(
+            MEDIA_ROOT=media_root,
+            RECIPE_IMAGE_RENDITIONS=RENDITIONS
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.recipes = [
+            Recipe.objects.create(
+                user=user,
+                title=title,
+                time_minutes=10,
+                price=5.00
+            )
+            for title in ('Curry', 'Salad')
+        ]
+
+    def lock_waiters(self):
+        """Return the number of other sessions waiting for a lock"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM pg_stat_activity "
+                "WHERE wait_event_type = 'Lock' AND pid <> pg_backend_pid()"
+            )
+            return cursor.fetchone()[0]
+
+    def test_release_waits_for_upload(self):
+        """Test an image uploaded again while it is released is kept"""
+        content = sample_image()
+        with transaction.atomic():
+            self.recipes[0].image.save('image.jpg', ContentFile(content))
+        previous = self.recipes[0].image
+        path = previous.path
+        self.recipes[0].image = None
+        self.recipes[0].save()
+
+        uploaded = threading.Event()
+        commit = threading.Event()
+        errors = []
+
+        def run(function):
+            try:
+                function()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        def upload():
+            with transaction.atomic():
+                self.recipes[1].image.save('image.jpg', ContentFile(content))
+                uploaded.set()
+                commit.wait(10)
+
+        uploader = threading.Thread(target=run, args=(upload,))
+        uploader.start()
+        self.assertTrue(uploaded.wait(10))
+        releaser = threading.Thread(
+            target=run,
+            args=(lambda: release_image(previous),)
+        )
+        releaser.start()
+        # let the release queue up behind the upload
+        deadline = time.monotonic() + 10
+        while not self.lock_waiters() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        commit.set()
+        uploader.join(10)
+        releaser.join(10)
+
+        self.assertEqual(errors, [])
+        self.recipes[1].refresh_from_db()
+        self.assertEqual(self.recipes[1].image.name, previous.name)
+        self.assertTrue(os.path.exists(path))
+
+    def test_save_outside_transaction(self):
+        """Test an image can be saved without a surrounding transaction"""
+        self.recipes[0].image.save('image.jpg', ContentFile(sample_image()))
+
+        self.recipes[0].refresh_from_db()
+        self.assertTrue(os.path.exists(self.recipes[0].image.path))
@@ -0,0 +1,145 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.images import rendition_names
+
+
+IMAGE_NAME = 'uploads/recipe/ab/cd/abcdef.png'
+CONTENT = b'0123456789'
+
+
+def media_url(name):
+    """Return the url a media file is served at"""
+    return reverse('media', args=[name])
+
+
+def read_response(response):
+    """Return the content of a file or streaming response"""
+    return b''.join(response.streaming_content)
+
+
+class MediaViewTests(TestCase):
+    """Test serving recipe images"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(
+            MEDIA_ROOT=media_root,
+            MEDIA_OFFLOAD_HEADER=''
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.storage = Recipe._meta.get_field('image').storage
+        self.storage.save(IMAGE_NAME, ContentFile(CONTENT))
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=5.00,
+            image=IMAGE_NAME
+        )
+
+    def test_serve_image(self):
+        """Test the owner gets the image with cache validators"""
+        res = self.client.get(media_url(IMAGE_NAME), HTTP_ACCEPT='image/*')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(read_response(res), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/png')
+        self.assertEqual(res['ETag'], '"abcdef.png"')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+
+    def test_serve_image_not_modified(self):
+        """Test a cached copy is validated by its entity tag"""
+        res = self.client.get(
+            media_url(IMAGE_NAME),
+            HTTP_IF_NONE_MATCH='"abcdef.png"'
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_serve_range(self):
+        """Test byte ranges are served as partial content"""
+        ranges = (
+            ('bytes=2-5', b'2345', 'bytes 2-5/10'),
+            ('bytes=7-', b'789', 'bytes 7-9/10'),
+            ('bytes=-3', b'789', 'bytes 7-9/10'),
+        )
+        for header, content, content_range in ranges:
+            res = self.client.get(media_url(IMAGE_NAME), HTTP_RANGE=header)
+            self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+            self.assertEqual(read_response(res), content)
+            self.assertEqual(res['Content-Range'], content_range)
+
+    def test_serve_range_unsatisfiable(self):
+        """Test a range past the end of the file is rejected"""
+        res = self.client.get(media_url(IMAGE_NAME), HTTP_RANGE='bytes=20-')
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+    def test_serve_range_stale_if_range(self):
+        """Test the whole file is sent if the client's copy is stale"""
+        res = self.client.get(
+            media_url(IMAGE_NAME),
+            HTTP_RANGE='bytes=2-5',
+            HTTP_IF_RANGE='"other.png"'
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(read_response(res), CONTENT)
+
+    def test_serve_rendition(self):
+        """Test renditions are served to the owner of their image"""
+        name = rendition_names(IMAGE_NAME)['thumbnail']
+        self.storage.save(name, ContentFile(CONTENT))
+        res = self.client.get(media_url(name))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_other_users_image_not_found(self):
+        """Test images are only served to the owners of their recipes"""
+        user2 = get_user_model().objects.create_user(
+            'other@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(user2)
+        res = self.client.get(media_url(IMAGE_NAME))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_login_required(self):
+        """Test images are not served to anonymous users"""
+        res = APIClient().get(media_url(IMAGE_NAME))
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_path_outside_media_root(self):
+        """Test paths escaping the media root are not found"""
+        res = self.client.get(media_url('uploads/../../etc/passwd'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(MEDIA_OFFLOAD_HEADER='X-Accel-Redirect')
+    def test_offload_to_proxy(self):
+        """Test the file is handed to the proxy when configured"""
+        res = self.client.get(media_url(IMAGE_NAME))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['X-Accel-Redirect'],
+            f'/protected-media/{IMAGE_NAME}'
+        )
+        self.assertEqual(res.content, b'')
@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import Recipe, Tag
+from recipe.pagination import KeysetPagination
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_recipe(user, **params):
+    """Create and return sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination of the recipe API lists"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def collect_pages(self, url, params):
+        """Follow next links and return the ids of every page"""
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in res.data['results']])
+            if res.data['next'] is None:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_recipe_pages_newest_first(self):
+        """Test recipes are paged newest first without gaps or repeats"""
+        recipes = [sample_recipe(self.user, title=f'R{i}') for i in range(7)]
+
+        pages = self.collect_pages(RECIPE_URL, {'page_size': 3})
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(
+            [pk for page in pages for pk in page],
+            [recipe.id for recipe in reversed(recipes)]
+        )
+
+    def test_tag_pages_ordered_by_name_then_id(self):
+        """Test tags with duplicate names are paged by name and id"""
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert', 'Dessert', 'Curry', 'Dessert')
+        ]
+
+        pages = self.collect_pages(TAGS_URL, {'page_size': 2})
+
+        expected = sorted(tags, key=lambda tag: (tag.name, tag.id))
+        self.assertEqual(
+            [pk for page in pages for pk in page],
+            [tag.id for tag in expected]
+        )
+
+    def test_page_size_capped(self):
+        """Test the requested page size cannot exceed the maximum"""
+        paginator = KeysetPagination()
+        cases = (
+            (KeysetPagination.max_page_size * 2,
+             KeysetPagination.max_page_size),
+            (3, 3),
+            ('abc', KeysetPagination.page_size),
+            (-1, KeysetPagination.page_size),
+        )
+        for value, expected in cases:
+            request = Request(
+                APIRequestFactory().get(RECIPE_URL, {'page_size': value})
+            )
+            self.assertEqual(paginator.get_page_size(request), expected)
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor returns 404"""
+        for cursor in ('not-a-cursor', 'W10=', 'eyJhIjoxfQ=='):
+            res = self.client.get(RECIPE_URL, {'cursor': cursor})
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor(self):
+        """Test a cursor with values of the wrong type returns 404"""
+        paginator = KeysetPagination()
+        cases = (
+            (RECIPE_URL, ['abc']),
+            (TAGS_URL, ['Vegan', 'abc']),
+            (TAGS_URL, ['abc', 'Vegan', 1]),
+        )
+        for url, position in cases:
+            params = {'cursor': paginator.encode_cursor(position)}
+            if len(position) == 3:
+                params['search'] = 'vegan'
+            res = self.client.get(url, params)
+            self.assertEqual(
+                res.status_code,
+                status.HTTP_404_NOT_FOUND,
+                position
+            )
+
+    def test_deep_page_uses_no_offset_or_count(self):
+        """Test later pages seek by key instead of OFFSET or COUNT"""
+        for i in range(5):
+            sample_recipe(self.user, title=f'R{i}')
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in ctx.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'])
+            self.assertNotIn('COUNT(', query['sql'])
@@ -0,0 +1,145 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.serializers import RecipeSerializer
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+# maximum number of queries each endpoint may run, however many rows
+# the user owns. Authentication is forced in these tests, so the
+# budgets only cover the work done by the view itself
+RECIPE_LIST_BUDGET = 3
+# retrieve reads the row version before loading the recipe
+RECIPE_DETAIL_BUDGET = 4
+ATTR_LIST_BUDGET = 1
+# validating a recipe looks up its tags and its ingredients
+RECIPE_VALIDATION_BUDGET = 2
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class QueryBudgetTests(TestCase):
+    """Test that recipe endpoints run a fixed number of queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def seed(self, count):
+        """Create count recipes, each with a few tags and ingredients"""
+        recipes = []
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=5.00
+            )
+            for j in range(3):
+                recipe.tags.add(
+                    Tag.objects.create(user=self.user, name=f'Tag {i}-{j}')
+                )
+                recipe.ingredients.add(
+                    Ingredient.objects.create(
+                        user=self.user,
+                        name=f'Ingredient {i}-{j}'
+                    )
+                )
+            recipes.append(recipe)
+        return recipes
+
+    def assertWithinBudget(self, budget, url, params=None):
+        """Request url and check it ran no more than budget queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(
+            len(ctx.captured_queries),
+            budget,
+            '\n'.join(query['sql'] for query in ctx.captured_queries)
+        )
+        return res
+
+    def test_recipe_list_budget(self):
+        """Test listing recipes runs a fixed number of queries"""
+        for count in (1, 15):
+            self.seed(count)
+            self.assertWithinBudget(RECIPE_LIST_BUDGET, RECIPE_URL)
+
+    def test_filtered_recipe_list_budget(self):
+        """Test filtering recipes runs a fixed number of queries"""
+        recipes = self.seed(15)
+        tag_ids = [tag.id for tag in recipes[0].tags.all()]
+        ingredient_ids = [
+            ingredient.id for ingredient in recipes[1].ingredients.all()
+        ]
+        self.assertWithinBudget(
+            RECIPE_LIST_BUDGET,
+            RECIPE_URL,
+            {
+                'tags': ','.join(str(pk) for pk in tag_ids),
+                'ingredients': ','.join(str(pk) for pk in ingredient_ids),
+            }
+        )
+
+    def test_recipe_detail_budget(self):
+        """Test retrieving a recipe runs a fixed number of queries"""
+        recipe = self.seed(15)[0]
+        self.assertWithinBudget(RECIPE_DETAIL_BUDGET, detail_url(recipe.id))
+
+    def test_attr_list_budget(self):
+        """Test listing tags and ingredients runs a single query"""
+        self.seed(15)
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            self.assertWithinBudget(ATTR_LIST_BUDGET, url)
+            self.assertWithinBudget(
+                ATTR_LIST_BUDGET,
+                url,
+                {'assigned_only': 1}
+            )
+
+    def test_recipe_validation_budget(self):
+        """Test validating related ids runs one query per relation"""
+        tags = Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'Tag {i}') for i in range(50)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=self.user, name=f'Ingredient {i}')
+            for i in range(50)
+        )
+        request = APIRequestFactory().post(RECIPE_URL)
+        request.user = self.user
+        serializer = RecipeSerializer(
+            data={
+                'title': 'Stew',
+                'time_minutes': 60,
+                'price': '8.00',
+                'tags': [tag.id for tag in tags],
+                'ingredients': [
+                    ingredient.id for ingredient in ingredients
+                ],
+            },
+            context={'request': request}
+        )
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(len(ctx.captured_queries), RECIPE_VALIDATION_BUDGET)
+        # the validated instances are saved as they are
+        self.assertEqual(serializer.validated_data['tags'], tags)
@@ -0,0 +1,178 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.counts import refresh_recipe_counts
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+USERS = 3
+RECIPES_PER_USER = 1000
+NAMES_PER_USER = 1000
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def plan_nodes(plan):
+    """Yield every node of a json query plan"""
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+class QueryPlanTests(TestCase):
+    """Test the queries of the hot endpoints are answered from indexes
+
+    Sequential scans are disabled for the tests, which makes postgres
+    pick an index whenever one can answer the query. A sequential scan
+    left in a plan therefore means an index is missing. The sort memory
+    is cut to the minimum, so a sort of more than a page of rows spills
+    to disk as it would on a large library.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            get_user_model().objects.create_user(
+                f'user{i}@google.com',
+                'testpass'
+            )
+            for i in range(USERS)
+        ]
+        cls.user = users[0]
+        for user in users:
+            tags = Tag.objects.bulk_create(
+                Tag(user=user, name=f'Tag {i}')
+                for i in range(NAMES_PER_USER)
+            )
+            ingredients = Ingredient.objects.bulk_create(
+                Ingredient(user=user, name=f'Ingredient {i}')
+                for i in range(NAMES_PER_USER)
+            )
+            recipes = Recipe.objects.bulk_create(
+                Recipe(user=user, title=f'Recipe {i}', time_minutes=10,
+                       price=5)
+                for i in range(RECIPES_PER_USER)
+            )
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+                for i, recipe in enumerate(recipes)
+                for tag in tags[i % NAMES_PER_USER:][:3]
+            )
+            Recipe.ingredients.through.objects.bulk_create(
+                Recipe.ingredients.through(
+                    recipe_id=recipe.id,
+                    ingredient_id=ingredient.id
+                )
+                for i, recipe in enumerate(recipes)
+                for ingredient in ingredients[i % NAMES_PER_USER:][:3]
+            )
+        # the relations were written in bulk, which sends no signals
+        refresh_recipe_counts(Tag)
+        refresh_recipe_counts(Ingredient)
+        cls.tag_ids = list(
+            Tag.objects.filter(user=cls.user).values_list('id', flat=True)[:2]
+        )
+        cls.ingredient_ids = list(Ingredient.objects.filter(
+            user=cls.user
+        ).values_list('id', flat=True)[:2])
+        cls.recipe_id = Recipe.objects.filter(user=cls.user).first().id
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'ANALYZE core_tag, core_ingredient, core_recipe, '
+                'core_recipe_tags, core_recipe_ingredients'
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute("SET LOCAL work_mem = '64kB'")
+
+    def explain(self, sql):
+        """Return the executed json plan of a query"""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def assertIndexedPlans(self, url, params=None, unsorted=False):
+        """Request url and check each query it ran uses indexes only
+
+        With unsorted, the rows must also be read in the order of an
+        index rather than sorted.
+        """
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(ctx.captured_queries)
+
+        for query in ctx.captured_queries:
+            plan = self.explain(query['sql'])
+            for node in plan_nodes(plan):
+                message = f'{node["Node Type"]} in plan of {query["sql"]}'
+                self.assertNotEqual(node['Node Type'], 'Seq Scan', message)
+                self.assertNotEqual(
+                    node.get('Sort Space Type'),
+                    'Disk',
+                    message
+                )
+                if node['Node Type'].endswith('Scan'):
+                    # an index that does not cover the conditions makes
+                    # the scan read rows only to throw them away
+                    self.assertLessEqual(
+                        node.get('Rows Removed by Filter', 0),
+                        node['Actual Rows'],
+                        message
+                    )
+                if unsorted:
+                    self.assertNotEqual(node['Node Type'], 'Sort', message)
+
+    def test_attr_list_plans(self):
+        """Test listing tags and ingredients uses indexes"""
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            self.assertIndexedPlans(url, unsorted=True)
+            self.assertIndexedPlans(url, {'assigned_only': 1}, unsorted=True)
+            self.assertIndexedPlans(
+                url,
+                {'ordering': '-recipe_count'},
+                unsorted=True
+            )
+
+    def test_recipe_list_plans(self):
+        """Test listing recipes uses indexes"""
+        self.assertIndexedPlans(RECIPE_URL, unsorted=True)
+
+    def test_filtered_recipe_list_plans(self):
+        """Test filtering recipes by tags and ingredients uses indexes"""
+        for match in ('any', 'all'):
+            self.assertIndexedPlans(RECIPE_URL, {
+                'tags': ','.join(str(pk) for pk in self.tag_ids),
+                'match': match,
+            })
+            self.assertIndexedPlans(RECIPE_URL, {
+                'ingredients': ','.join(
+                    str(pk) for pk in self.ingredient_ids
+                ),
+                'match': match,
+            })
+
+    def test_recipe_detail_plans(self):
+        """Test retrieving a recipe uses indexes"""
+        self.assertIndexedPlans(detail_url(self.recipe_id))
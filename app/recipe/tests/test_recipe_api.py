@@ -84,7 +84,7 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """Test retrieving recipes for user"""
@@ -101,8 +101,8 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
@@ -170,6 +170,29 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_with_other_users_tags(self):
+        """Test every tag the user does not own is reported"""
+        user2 = get_user_model().objects.create_user(
+            'other@google.com',
+            'testpass'
+        )
+        tag = sample_tag(user=self.user)
+        other1 = sample_tag(user=user2, name='Vegan')
+        other2 = sample_tag(user=user2, name='Dessert')
+        payload = {
+            'title': 'Cheesecake',
+            'tags': [tag.id, other1.id, other2.id],
+            'time_minutes': 60,
+            'price': 20.00
+        }
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertIn(str(other1.id), res.data['tags'][0])
+        self.assertIn(str(other2.id), res.data['tags'][1])
+        self.assertFalse(Recipe.objects.exists())
+
     def test_partial_update_recipe(self):
         """Test partial updates"""
         recipe = sample_recipe(user=self.user)
@@ -267,9 +290,9 @@ class RecipeImageUploadTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipes_by_ingredients(self):
         """Test retirning recipes with specific ingredients"""
@@ -288,6 +311,70 @@ class RecipeImageUploadTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+
+class RecipeFilterTests(TestCase):
+    """Test any/all filtering of recipes by tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(user=self.user, name='Vegan')
+        self.quick = sample_tag(user=self.user, name='Quick')
+        self.salt = sample_ingredient(user=self.user, name='Salt')
+        self.both = sample_recipe(user=self.user, title='Both')
+        self.both.tags.add(self.vegan, self.quick)
+        self.both.ingredients.add(self.salt)
+        self.vegan_only = sample_recipe(user=self.user, title='Vegan only')
+        self.vegan_only.tags.add(self.vegan)
+
+    def filter_ids(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_match_any_returns_each_recipe_once(self):
+        """Test a recipe matching several tags is returned once"""
+        ids = self.filter_ids({'tags': f'{self.vegan.id},{self.quick.id}'})
+        self.assertEqual(sorted(ids), sorted([self.both.id,
+                                              self.vegan_only.id]))
+
+    def test_match_all(self):
+        """Test match=all only returns recipes with every tag"""
+        ids = self.filter_ids({
+            'tags': f'{self.vegan.id},{self.quick.id}',
+            'match': 'all',
+        })
+        self.assertEqual(ids, [self.both.id])
+
+    def test_match_all_with_repeated_ids(self):
+        """Test repeating an id does not change match=all results"""
+        ids = self.filter_ids({
+            'tags': f'{self.vegan.id},{self.vegan.id}',
+            'match': 'all',
+        })
+        self.assertEqual(sorted(ids), sorted([self.both.id,
+                                              self.vegan_only.id]))
+
+    def test_combined_filters(self):
+        """Test tag and ingredient filters combine without duplicates"""
+        ids = self.filter_ids({
+            'tags': f'{self.vegan.id},{self.quick.id}',
+            'ingredients': f'{self.salt.id}',
+        })
+        self.assertEqual(ids, [self.both.id])
+
+    def test_invalid_match(self):
+        """Test an unknown match mode is rejected"""
+        res = self.client.get(
+            RECIPE_URL,
+            {'tags': f'{self.vegan.id}', 'match': 'some'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.rows import RowSerializer
+from recipe.serializers import RecipeSerializer, TagSerializer, \
+    IngredientSerializer
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class RowSerializerTests(TestCase):
+    """Test rows are rendered exactly like the serializers render models"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert', 'Spicy')
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Salt', 'Sugar')
+        ]
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=20,
+            price=Decimal('5.50'),
+            link='https://example.com/curry'
+        )
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(*ingredients)
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Water',
+            time_minutes=1,
+            price=0
+        )
+
+    def assertRendersLikeSerializer(self, serializer_class, queryset):
+        """Check rows of queryset render like its instances"""
+        row_serializer = RowSerializer(serializer_class)
+        rows = list(queryset.values(*row_serializer.columns))
+        self.assertEqual(
+            row_serializer.render(rows),
+            serializer_class(queryset, many=True).data
+        )
+
+    def test_render_recipes(self):
+        """Test recipes with and without relations render the same"""
+        self.assertRendersLikeSerializer(
+            RecipeSerializer,
+            Recipe.objects.order_by('id')
+        )
+
+    def test_render_tags_and_ingredients(self):
+        """Test tags and ingredients render the same"""
+        self.assertRendersLikeSerializer(
+            TagSerializer,
+            Tag.objects.order_by('id')
+        )
+        self.assertRendersLikeSerializer(
+            IngredientSerializer,
+            Ingredient.objects.order_by('id')
+        )
+
+    def test_list_responses(self):
+        """Test list responses render the same as the serializers"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(RECIPE_URL, {'search': 'curry'})
+        self.assertEqual(
+            res.data['results'],
+            RecipeSerializer(
+                Recipe.objects.filter(title='Curry'),
+                many=True
+            ).data
+        )
+        self.assertEqual(res.data['results'][0]['price'], '5.50')
+        res = client.get(TAGS_URL, {'ordering': '-recipe_count'})
+        self.assertEqual(
+            res.data['results'],
+            TagSerializer(Tag.objects.order_by('name'), many=True).data
+        )
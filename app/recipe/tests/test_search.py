@@ -0,0 +1,144 @@
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.search import SEARCH_CONFIG, search_names, search_recipes
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def sample_recipe(user, **params):
+    """Create and return sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class SearchApiTests(TestCase):
+    """Test searching recipes, tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@google.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, url, text):
+        res = self.client.get(url, {'search': text})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data['results']
+
+    def test_search_recipe_words(self):
+        """Test recipes match on stemmed title words"""
+        curry = sample_recipe(self.user, title='Spicy chicken curries')
+        sample_recipe(self.user, title='Chocolate cake')
+
+        results = self.search(RECIPE_URL, 'curry')
+
+        self.assertEqual([recipe['id'] for recipe in results], [curry.id])
+
+    def test_search_recipe_typo_and_prefix(self):
+        """Test recipes match misspelt and partial titles"""
+        cake = sample_recipe(self.user, title='Chocolate cake')
+        sample_recipe(self.user, title='Beef stew')
+
+        for text in ('Chocolate cakes', 'chocolat', 'choc'):
+            results = self.search(RECIPE_URL, text)
+            self.assertEqual([recipe['id'] for recipe in results], [cake.id])
+
+    def test_search_ranked_by_relevance(self):
+        """Test the closest title is returned first"""
+        sample_recipe(self.user, title='Carrot cake with walnuts')
+        exact = sample_recipe(self.user, title='Carrot cake')
+        sample_recipe(self.user, title='Carrot soup')
+
+        results = self.search(RECIPE_URL, 'carrot cake')
+
+        self.assertEqual(results[0]['id'], exact.id)
+
+    def test_search_limited_to_user(self):
+        """Test search never returns other users' recipes"""
+        user2 = get_user_model().objects.create_user(
+            'other@google.com',
+            'testpass'
+        )
+        sample_recipe(user2, title='Chocolate cake')
+        self.assertEqual(self.search(RECIPE_URL, 'chocolate'), [])
+
+    def test_search_pages(self):
+        """Test ranked search results can be paged through"""
+        for i in range(5):
+            sample_recipe(self.user, title=f'Tomato soup {i}')
+
+        ids = []
+        res = self.client.get(RECIPE_URL, {'search': 'soup', 'page_size': 2})
+        while True:
+            ids += [recipe['id'] for recipe in res.data['results']]
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_search_tags_and_ingredients(self):
+        """Test tag and ingredient names can be searched"""
+        tag = Tag.objects.create(user=self.user, name='Vegetarian')
+        Tag.objects.create(user=self.user, name='Dessert')
+        ingredient = Ingredient.objects.create(user=self.user, name='Paprika')
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        tags = self.search(TAGS_URL, 'vegetarain')
+        ingredients = self.search(INGREDIENTS_URL, 'papr')
+
+        self.assertEqual([item['id'] for item in tags], [tag.id])
+        self.assertEqual([item['id'] for item in ingredients],
+                         [ingredient.id])
+
+    def test_word_search_uses_index(self):
+        """Test the title vector matches the full-text index"""
+        queryset = Recipe.objects.annotate(
+            title_vector=SearchVector('title', config=SEARCH_CONFIG)
+        ).filter(title_vector=SearchQuery('curry', config=SEARCH_CONFIG))
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assertIn('core_recipe_title_search', queryset.explain())
+
+    def test_search_uses_indexes(self):
+        """Test every branch of the search predicate uses an index
+
+        If one of the OR'd conditions has no index, postgres cannot
+        combine the index scans and reads every row instead.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT indexdef FROM pg_indexes '
+                "WHERE indexname = 'core_recipe_title_trgm'"
+            )
+            if 'gin_trgm_ops' not in cursor.fetchone()[0]:
+                self.skipTest('the trigram indexes need pg_trgm')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        plan = search_recipes(Recipe.objects.all(), 'curry').explain()
+        self.assertIn('BitmapOr', plan)
+        self.assertIn('core_recipe_title_search', plan)
+        self.assertIn('core_recipe_title_trgm', plan)
+        self.assertNotIn('Seq Scan', plan)
+
+        plan = search_names(Tag.objects.all(), 'vegan').explain()
+        self.assertIn('core_tag_name_trgm', plan)
+        self.assertNotIn('Seq Scan', plan)
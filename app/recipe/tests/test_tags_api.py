@@ -48,7 +48,7 @@ class PrivateTagsApiTest(TestCase):
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # data base should yield the same result as GET request#
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test that tags returned are only for the authenticated user"""
@@ -64,8 +64,8 @@ class PrivateTagsApiTest(TestCase):
         response = self.client.get(TAGS_URL)
         # make sure user2's objects cannot be accessed by user1
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['name'], tag.name)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['name'], tag.name)
 
     def test_create_tag_successful(self):
         """Test creating a new tag"""
@@ -99,10 +99,11 @@ class PrivateTagsApiTest(TestCase):
         recipe.tags.add(tag1)
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
+        tag1.refresh_from_db()
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_retrieve_unique_tags(self):
         """Test returned filtering tags are unique"""
@@ -125,4 +126,73 @@ class PrivateTagsApiTest(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_recipe_count_maintained(self):
+        """Test the recipe count follows the tag's recipes"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe1 = Recipe.objects.create(
+            title='Pancake',
+            time_minutes=5,
+            price=Decimal('2.33'),
+            user=self.user
+        )
+        recipe2 = Recipe.objects.create(
+            title='Porridge',
+            time_minutes=10,
+            price=Decimal('3.11'),
+            user=self.user
+        )
+
+        def recipe_count():
+            tag.refresh_from_db()
+            return tag.recipe_count
+
+        recipe1.tags.add(tag)
+        recipe2.tags.add(tag)
+        self.assertEqual(recipe_count(), 2)
+        recipe1.tags.remove(tag)
+        self.assertEqual(recipe_count(), 1)
+        recipe2.tags.clear()
+        self.assertEqual(recipe_count(), 0)
+        tag.recipe_set.add(recipe1, recipe2)
+        self.assertEqual(recipe_count(), 2)
+        recipe1.delete()
+        self.assertEqual(recipe_count(), 1)
+        tag.recipe_set.clear()
+        self.assertEqual(recipe_count(), 0)
+
+    def test_order_by_recipe_count(self):
+        """Test ordering tags by the number of recipes using them"""
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Dinner', 'Breakfast', 'Lunch')
+        ]
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=Decimal('2.00'),
+                user=self.user
+            )
+            recipe.tags.add(*tags[i:])
+
+        res = self.client.get(
+            TAGS_URL,
+            {'ordering': '-recipe_count', 'page_size': 2}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(tag['name'], tag['recipe_count'])
+             for tag in res.data['results']],
+            [('Lunch', 3), ('Breakfast', 2)]
+        )
+        res = self.client.get(res.data['next'])
+        self.assertEqual(res.data['results'][0]['name'], 'Dinner')
+
+    def test_invalid_ordering(self):
+        """Test an unknown ordering is rejected"""
+        res = self.client.get(TAGS_URL, {'ordering': 'user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
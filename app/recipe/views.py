@@ -1,21 +1,54 @@
+import os
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 
 from core.models import Tag, Ingredient, Recipe
 from recipe import serializers
+from recipe.bulk import MAX_BULK_ITEMS, check_items, write_items
+from recipe.export import EXPORT_TYPES, export_rows
+from recipe.images import image_lookup, is_rendered, release_image, \
+    schedule_renditions
+from recipe.media import IgnoreAcceptNegotiation, media_response
+from recipe.mixins import CachedListMixin, ConditionalListMixin, \
+    ConditionalRetrieveMixin, FragmentListMixin, FragmentRetrieveMixin, \
+    RowListMixin
+from recipe.pagination import RecipePagination, NamePagination
+from recipe.rows import RowSerializer
+from recipe.search import search_recipes, search_names
+from user.authentication import CachedTokenAuthentication, \
+    SignedTokenAuthentication
 
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import status
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(ConditionalListMixin,
+                            CachedListMixin,
+                            RowListMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base viewset for user owned recipe attrs"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    )
     permission_classes = (IsAuthenticated,)
+    pagination_class = NamePagination
+    # keyset orderings clients can pick with ?ordering=, besides the
+    # default by name. Each is served by an index of the model
+    orderings = {
+        'name': ('name', 'id'),
+        '-recipe_count': ('-recipe_count', 'name', 'id'),
+    }
 
     # A user must be authenticated to invoke this function
     # From ListModelMixin
@@ -26,14 +59,33 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
             # convert string to integer first. If None, default 0
             int(self.request.query_params.get('assigned_only', 0))
         )
+        search = self.request.query_params.get('search')
+        ordering = self.request.query_params.get('ordering')
+        if ordering is not None and ordering not in self.orderings:
+            raise ValidationError({'ordering': [
+                'Must be one of: ' + ', '.join(self.orderings) + '.'
+            ]})
         queryset = self.queryset
         if assigned_only:
-            # return only tags/ingredients that are assigned to recipe
-            queryset = queryset.filter(recipe__isnull=False)
+            # return only tags/ingredients that are assigned to recipe.
+            # The stored count saves joining the recipes
+            queryset = queryset.filter(recipe_count__gt=0)
+        if search:
+            queryset = search_names(queryset, search)
 
         return queryset.filter(
             user=self.request.user
-            ).order_by('name').distinct()
+            ).order_by('name')
+
+    def get_keyset_ordering(self):
+        """Order by the requested ordering, or search results by
+        relevance"""
+        ordering = self.request.query_params.get('ordering')
+        if ordering:
+            return self.orderings[ordering]
+        if self.request.query_params.get('search'):
+            return ('-rank', 'name', 'id')
+        return None
 
     # connect the foreign key to model. From CreateModelMixin
     def perform_create(self, serializer):
@@ -45,41 +97,106 @@ class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    row_serializer = RowSerializer(serializers.TagSerializer)
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database"""
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    row_serializer = RowSerializer(serializers.IngredientSerializer)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalListMixin,
+                    ConditionalRetrieveMixin,
+                    CachedListMixin,
+                    FragmentListMixin,
+                    FragmentRetrieveMixin,
+                    viewsets.ModelViewSet):
     """Manage recipes in the database"""
     serializer_class = serializers.RecipeSerializer
+    row_serializer = RowSerializer(serializers.RecipeSerializer)
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    )
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipePagination
+    # recipes read from the database at a time by the export
+    export_chunk_size = 2000
+
+    # related objects each action's serializer renders. Loading them up
+    # front keeps the query count fixed no matter how many recipes
+    # are returned. The list serializer only renders primary keys, so
+    # there is no need to load the full tag/ingredient rows for it
+    action_prefetches = {
+        'list': (
+            Prefetch('tags', queryset=Tag.objects.only('id')),
+            Prefetch('ingredients', queryset=Ingredient.objects.only('id')),
+        ),
+        'retrieve': ('tags', 'ingredients'),
+    }
 
     # implement a private function
     def _params_to_ints(self, querystring):
         """convert list of string IDs to a list of integers"""
         return [int(str_id) for str_id in querystring.split(',')]
 
+    def _filter_related(self, queryset, through, column, ids, match):
+        """Filter recipes by related ids without joining the relation
+
+        The relation is queried in a subquery, so each recipe is
+        returned once however many of the ids it matches. Matching all
+        ids groups the relation rows by recipe and keeps the recipes
+        with one row per requested id. A recipe has at most one row per
+        related object, so no DISTINCT is needed for the count.
+        """
+        related = through.objects.filter(**{f'{column}__in': ids})
+        if match == 'all':
+            related = related.values('recipe_id').annotate(
+                matched=Count(column)
+            ).filter(matched=len(set(ids)))
+        return queryset.filter(id__in=related.values('recipe_id'))
+
     def get_queryset(self):
         """Retrieve the recipes"""
         # a dictionary containing all the query parameters
         # specfied in the get request
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        search = self.request.query_params.get('search')
+        # whether recipes need any or all of the tags/ingredients given
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'Must be "any" or "all".'})
         queryset = self.queryset
         if tags:
             tag_ids = self._params_to_ints(tags)
-            # filter on foreign key objects
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_related(
+                queryset, Recipe.tags.through, 'tag_id', tag_ids, match
+            )
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        return queryset.filter(user=self.request.user)
+            queryset = self._filter_related(
+                queryset,
+                Recipe.ingredients.through,
+                'ingredient_id',
+                ingredient_ids,
+                match
+            )
+        if search:
+            queryset = search_recipes(queryset, search)
+        prefetches = self.action_prefetches.get(self.action, ())
+        return queryset.filter(
+            user=self.request.user
+            ).prefetch_related(*prefetches).order_by('-id')
+
+    def get_keyset_ordering(self):
+        """Order search results by relevance"""
+        if self.request.query_params.get('search'):
+            return ('-rank', '-id')
+        return None
 
     def get_serializer_class(self):
         """Change serializer class depending on the action
@@ -89,12 +206,71 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'bulk':
+            return serializers.RecipeBulkSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create or replace many recipes in one request
+
+        The whole batch is written or, if any recipe is invalid, none
+        of it. Errors are returned in a list aligned with the request.
+        """
+        if not isinstance(request.data, list) or not request.data:
+            raise ValidationError(
+                {'non_field_errors': ['Expected a list of recipes.']}
+            )
+        if len(request.data) > MAX_BULK_ITEMS:
+            raise ValidationError({'non_field_errors': [
+                f'Ensure there are no more than {MAX_BULK_ITEMS} recipes.'
+            ]})
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        items = serializer.validated_data
+        errors = check_items(request.user, items)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = write_items(request.user, items)
+        recipes = Recipe.objects.filter(id__in=ids).prefetch_related(
+            *self.action_prefetches['list']
+        ).in_bulk()
+        serializer = serializers.RecipeSerializer(
+            [recipes[pk] for pk in ids],
+            many=True
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """Stream all recipes matching the filters as ndjson or csv"""
+        # "format" is taken by the renderer negotiation
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in EXPORT_TYPES:
+            raise ValidationError({'type': [
+                'Must be one of: ' + ', '.join(EXPORT_TYPES) + '.'
+            ]})
+        content_type, lines = EXPORT_TYPES[export_type]
+
+        rows = export_rows(self.get_queryset(), self.export_chunk_size)
+        response = StreamingHttpResponse(
+            lines(rows),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{export_type}"'
+        return response
+
     # Add custom actions. works on detail views/urls only
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
@@ -108,7 +284,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            previous = recipe.image
+            # storing the image locks its name until the recipe using
+            # it is committed, see release_image
+            with transaction.atomic():
+                recipe = serializer.save(image_status=Recipe.IMAGE_PENDING)
+                if is_rendered(recipe):
+                    recipe.image_status = Recipe.IMAGE_READY
+                    recipe.save(update_fields=('image_status',))
+                else:
+                    # the renditions are rendered once the new image is
+                    # committed, without holding up the response
+                    transaction.on_commit(
+                        lambda: schedule_renditions(recipe)
+                    )
+                if previous != recipe.image:
+                    transaction.on_commit(lambda: release_image(previous))
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -118,3 +309,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class MediaView(APIView):
+    """Serve recipe images to the owners of the recipes using them"""
+    authentication_classes = (
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    )
+    permission_classes = (IsAuthenticated,)
+    content_negotiation_class = IgnoreAcceptNegotiation
+
+    def get(self, request, path):
+        """Return the image, or a part of it"""
+        storage = Recipe._meta.get_field('image').storage
+        try:
+            full_path = storage.path(path)
+        except SuspiciousFileOperation:
+            raise Http404
+        # a single indexed lookup, no recipe or relation is loaded
+        owned = Recipe.objects.filter(
+            user=request.user,
+            **image_lookup(path)
+        ).exists()
+        if not owned or not os.path.isfile(full_path):
+            raise Http404
+        return media_response(request, path, full_path)
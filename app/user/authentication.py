@@ -0,0 +1,107 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, \
+    TokenAuthentication, get_authorization_header
+
+from core.cache import build_cache
+from user.tokens import read_token, InvalidToken
+
+
+# token key -> (user, token, revocation version) of recently
+# authenticated requests
+token_cache = build_cache(settings.AUTH_TOKEN_CACHE)
+
+
+def _revocation_key(user_id):
+    return f'user:token-version:{user_id}'
+
+
+def get_revocation_version(user_id):
+    """Return the current revocation version of a user's tokens
+
+    It lives in the shared default cache, so a revocation in one
+    process reaches the token caches of all of them. Like the recipe
+    data versions it is a random token, so an evicted version is
+    replaced by one no cached token was stored under.
+    """
+    key = _revocation_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # another process may have created the version in the meantime
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_revocation_version(user_id):
+    cache.set(_revocation_key(user_id), uuid.uuid4().hex, None)
+
+
+def revoke_user_tokens(user_id):
+    """Drop the cached tokens of a user in every process"""
+    bump_revocation_version(user_id)
+    # bump again once the change is visible to other connections, so
+    # a lookup made before the commit cannot be cached past it
+    transaction.on_commit(lambda: bump_revocation_version(user_id))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that skips the database for known tokens
+
+    Cached entries are only used while the revocation version of
+    their user is unchanged, which costs a read of the shared cache
+    rather than a query. Deleting a token or changing its user bumps
+    the version, so the token stops working at once in every process.
+    """
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is not None:
+            user, token, version = entry
+            if version == get_revocation_version(user.pk):
+                return user, token
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (user, token, get_revocation_version(user.pk)))
+        return user, token
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authenticate signed access tokens without touching the database
+
+    Clients send "Authorization: Bearer <token>". The user is rebuilt
+    from the id in the token with every other field deferred, so it
+    is only loaded if a view actually reads one of them.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            msg = _('Invalid bearer header')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            user_id = read_token(auth[1].decode(), 'access')
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token'))
+        except InvalidToken as error:
+            raise exceptions.AuthenticationFailed(str(error))
+
+        user_model = get_user_model()
+        user = user_model.from_db(
+            router.db_for_read(user_model),
+            ['id'],
+            [user_id]
+        )
+        return user, None
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model, authenticate
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 
+from user.tokens import read_token, InvalidToken
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the users object"""
@@ -57,3 +59,29 @@ class AuthTokenSerializer(serializers.Serializer):
             raise serializers.ValidationError(msg, code='authentication')
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for exchanging a refresh token for new tokens"""
+    refresh = serializers.CharField(trim_whitespace=False)
+
+    def validate(self, attrs):
+        """Validate the refresh token and look up its active user"""
+        try:
+            user_id = read_token(attrs.get('refresh'), 'refresh')
+        except InvalidToken as error:
+            raise serializers.ValidationError(
+                str(error),
+                code='authentication'
+            )
+        # unlike access tokens, the user is checked on every refresh,
+        # which bounds how long a deactivated user keeps access
+        user = get_user_model().objects.filter(
+            pk=user_id,
+            is_active=True
+        ).first()
+        if user is None:
+            msg = _('Unable to authenticate with provided credentials')
+            raise serializers.ValidationError(msg, code='authentication')
+        attrs['user'] = user
+        return attrs
@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from rest_framework.authtoken.models import Token
+
+from user.authentication import token_cache, revoke_user_tokens
+
+
+def forget_token(sender, instance, **kwargs):
+    """Revoke a deleted token in the authentication caches"""
+    token_cache.delete(instance.key)
+    revoke_user_tokens(instance.user_id)
+
+
+def forget_user_tokens(sender, instance, created, **kwargs):
+    """Revoke a changed user's tokens in the authentication caches, so
+    deactivation takes effect on the next request"""
+    if created:
+        return
+    revoke_user_tokens(instance.pk)
+
+
+post_delete.connect(forget_token, sender=Token)
+post_save.connect(forget_user_tokens, sender=get_user_model())
@@ -0,0 +1,48 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from user.authentication import CachedTokenAuthentication, token_cache
+
+
+REQUESTS = 5000
+
+
+class TokenAuthenticationBenchmark(TestCase):
+    """Compare the per-request cost of database and cached token auth"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email='test@google.com',
+            password='testpass'
+        )
+        token = Token.objects.create(user=user)
+        self.request = APIRequestFactory().get(
+            '/',
+            HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        token_cache.clear()
+
+    def time_authentication(self, authentication):
+        """Return the mean seconds spent authenticating a request"""
+        authentication.authenticate(Request(self.request))
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            authentication.authenticate(Request(self.request))
+        return (time.perf_counter() - start) / REQUESTS
+
+    def test_authentication_overhead(self):
+        uncached = self.time_authentication(TokenAuthentication())
+        cached = self.time_authentication(CachedTokenAuthentication())
+
+        print(
+            f'\ntoken authentication x{REQUESTS}: '
+            f'TokenAuthentication {uncached * 1e6:.1f}us/request, '
+            f'CachedTokenAuthentication {cached * 1e6:.1f}us/request'
+        )
+        self.assertLess(cached, uncached)
@@ -0,0 +1,128 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import tokens
+
+
+TOKEN_URL = reverse('user:token')
+REFRESH_URL = reverse('user:token-refresh')
+ME_URL = reverse('user:me')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(USER_TOKEN_MODE='signed')
+class SignedTokenTests(TestCase):
+    """Test issuing and using signed access tokens"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@google.com',
+            password='testpass',
+            name='Test name'
+        )
+
+    def obtain_tokens(self):
+        res = self.client.post(
+            TOKEN_URL,
+            {'email': 'test@google.com', 'password': 'testpass'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_create_signed_tokens(self):
+        """Test signed mode issues an access and a refresh token"""
+        data = self.obtain_tokens()
+        self.assertEqual(data['token_type'], 'Bearer')
+        self.assertIn('access', data)
+        self.assertIn('refresh', data)
+        self.assertNotIn('token', data)
+
+    @override_settings(USER_TOKEN_MODE='db')
+    def test_db_mode_still_available(self):
+        """Test db mode keeps issuing database tokens"""
+        res = self.client.post(
+            TOKEN_URL,
+            {'email': 'test@google.com', 'password': 'testpass'}
+        )
+        self.assertIn('token', res.data)
+
+    def test_access_token_skips_database(self):
+        """Test recipe endpoints authenticate signed tokens without a
+        query of their own"""
+        access = self.obtain_tokens()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.client.get(RECIPE_URL)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_me_loads_user(self):
+        """Test the user endpoints load the user behind the token"""
+        access = self.obtain_tokens()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(res.data['name'], self.user.name)
+
+    def test_invalid_access_token(self):
+        """Test tampered, expired and refresh tokens are rejected"""
+        data = self.obtain_tokens()
+        with patch('django.core.signing.time.time') as mock_time:
+            mock_time.return_value = 0
+            expired = tokens.issue_token(self.user, 'access')
+
+        for token in (data['access'] + 'x', data['refresh'], expired):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            res = self.client.get(RECIPE_URL)
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_token(self):
+        """Test a refresh token is exchanged for new tokens"""
+        refresh = self.obtain_tokens()['refresh']
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('access', res.data)
+        self.assertIn('refresh', res.data)
+
+    def test_refresh_rejected_for_inactive_user(self):
+        """Test refreshing fails once the user is deactivated"""
+        data = self.obtain_tokens()
+        self.user.is_active = False
+        self.user.save()
+
+        for token in (data['refresh'], data['access']):
+            res = self.client.post(REFRESH_URL, {'refresh': token})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_key_rotation(self):
+        """Test tokens signed by a retired key stop being accepted"""
+        old_keys = [('old', 'old-secret')]
+        with override_settings(SIGNED_TOKEN_KEYS=old_keys):
+            access = tokens.issue_token(self.user, 'access')
+
+        rotated = [('new', 'new-secret')] + old_keys
+        with override_settings(SIGNED_TOKEN_KEYS=rotated):
+            self.assertEqual(tokens.read_token(access, 'access'), self.user.pk)
+            self.assertTrue(
+                tokens.issue_token(self.user, 'access').startswith('new.')
+            )
+
+        with override_settings(SIGNED_TOKEN_KEYS=[('new', 'new-secret')]):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.read_token(access, 'access')
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core import signing
+from django.utils.translation import ugettext_lazy as _
+
+
+class InvalidToken(Exception):
+    """Raised when a signed token is malformed, tampered or expired"""
+
+
+def _signing_keys():
+    """Return the {key id: secret} map of the configured signing keys"""
+    return dict(settings.SIGNED_TOKEN_KEYS)
+
+
+def issue_token(user, kind):
+    """Return a signed token of kind ('access' or 'refresh') for user
+
+    Tokens are signed with the first configured key and carry its id,
+    so older keys can still verify the tokens they signed while they
+    are being rotated out.
+    """
+    key_id, secret = settings.SIGNED_TOKEN_KEYS[0]
+    value = signing.dumps(
+        {'uid': user.pk},
+        key=secret,
+        salt=f'user.tokens.{kind}'
+    )
+    return f'{key_id}.{value}'
+
+
+def issue_token_pair(user):
+    """Return a fresh access and refresh token for user"""
+    return {
+        'token_type': 'Bearer',
+        'access': issue_token(user, 'access'),
+        'expires_in': settings.SIGNED_TOKEN_LIFETIMES['access'],
+        'refresh': issue_token(user, 'refresh'),
+    }
+
+
+def read_token(token, kind):
+    """Return the user id carried by a valid token of kind"""
+    key_id, separator, value = token.partition('.')
+    secret = _signing_keys().get(key_id)
+    if secret is None:
+        raise InvalidToken(_('Unknown signing key'))
+    try:
+        payload = signing.loads(
+            value,
+            key=secret,
+            salt=f'user.tokens.{kind}',
+            max_age=settings.SIGNED_TOKEN_LIFETIMES[kind]
+        )
+    except signing.SignatureExpired:
+        raise InvalidToken(_('Token has expired'))
+    except signing.BadSignature:
+        raise InvalidToken(_('Invalid token'))
+    return payload['uid']
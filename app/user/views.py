@@ -1,7 +1,14 @@
-from rest_framework import generics, authentication, permissions
+from django.conf import settings
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
-from user.serializers import UserSerializer, AuthTokenSerializer
+from rest_framework.views import APIView
+from user.authentication import CachedTokenAuthentication, \
+    SignedTokenAuthentication
+from user.serializers import UserSerializer, AuthTokenSerializer, \
+    RefreshTokenSerializer
+from user.tokens import issue_token_pair
 
 
 # CreateAPIView is premade API view for serializers
@@ -15,13 +22,38 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        """Issue a database token, or signed tokens in signed mode"""
+        if settings.USER_TOKEN_MODE != 'signed':
+            return super().post(request, *args, **kwargs)
+        serializer = self.serializer_class(
+            data=request.data,
+            context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        return Response(issue_token_pair(serializer.validated_data['user']))
+
+
+class RefreshTokenView(APIView):
+    """Exchange a refresh token for a new pair of signed tokens"""
+    serializer_class = RefreshTokenSerializer
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(issue_token_pair(serializer.validated_data['user']))
+
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
 
     # specify the mechanism by which authentication occurs
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    )
     permission_classes = (permissions.IsAuthenticated,)
 
     # override the original method which would retrieve database model
@@ -29,4 +61,9 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     # the user being authenticated
     def get_object(self):
         """Retrieve and return authenticated user"""
-        return self.request.user
+        user = self.request.user
+        # users authenticated by a signed token only have their id loaded
+        deferred_fields = user.get_deferred_fields()
+        if deferred_fields:
+            user.refresh_from_db(fields=deferred_fields)
+        return user